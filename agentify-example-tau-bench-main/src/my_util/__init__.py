@@ -1,5 +1,5 @@
 import re
-from typing import Dict
+from typing import Dict, List
 
 
 def parse_tags(str_with_tags: str) -> Dict[str, str]:
@@ -9,6 +9,43 @@ def parse_tags(str_with_tags: str) -> Dict[str, str]:
     return {tag: content.strip() for tag, content in tags}
 
 
+# rough characters per token, used to keep a message history near a token budget
+CHARS_PER_TOKEN = 4
+KEEP_RECENT_MESSAGES = 4
+ELIDED_HEAD_CHARS = 200
+ELIDED_MARKER = "[earlier tool result elided:"
+
+
+def compact_messages(messages: List[Dict], max_tokens: int) -> int:
+    """elide the oldest "Tool call result:" messages in place until the history fits max_tokens; return the estimated tokens saved"""
+
+    def tokens(text: str) -> int:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+    if max_tokens <= 0:
+        return 0
+
+    total = sum(tokens(message["content"] or "") for message in messages)
+    saved = 0
+    for index in range(1, len(messages) - KEEP_RECENT_MESSAGES):
+        if total <= max_tokens:
+            break
+        message = messages[index]
+        content = message["content"] or ""
+        if message["role"] != "user" or not content.lstrip().startswith("Tool call result:"):
+            continue
+        if ELIDED_MARKER in content:
+            continue
+        elided = f"{content[:ELIDED_HEAD_CHARS]}... {ELIDED_MARKER} {len(content)} characters]"
+        reduction = tokens(content) - tokens(elided)
+        if reduction <= 0:
+            continue
+        messages[index] = {**message, "content": elided}
+        total -= reduction
+        saved += reduction
+    return saved
+
+
 if __name__ == "__main__":
     test_str = "<tag1>Hello</tag1> some text <tag2>World</tag2>"
     print(parse_tags(test_str))
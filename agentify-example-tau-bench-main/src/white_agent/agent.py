@@ -1,5 +1,6 @@
 """White agent implementation - the target agent being tested."""
 
+import os
 import uvicorn
 import dotenv
 from a2a.server.apps import A2AStarletteApplication
@@ -10,10 +11,14 @@ from a2a.server.tasks import InMemoryTaskStore
 from a2a.types import AgentSkill, AgentCard, AgentCapabilities
 from a2a.utils import new_agent_text_message
 from litellm import completion
+from src.my_util import compact_messages
 
 
 dotenv.load_dotenv()
 
+# estimated tokens of history past which old tool results are elided (0 keeps everything)
+HISTORY_TOKEN_BUDGET = int(os.getenv("WHITE_AGENT_HISTORY_TOKENS", "8000"))
+
 
 def prepare_white_agent_card(url):
     skill = AgentSkill(
@@ -52,6 +57,11 @@ class GeneralWhiteAgentExecutor(AgentExecutor):
                 "content": user_input,
             }
         )
+        tokens_saved = compact_messages(messages, HISTORY_TOKEN_BUDGET)
+        if tokens_saved:
+            print(
+                f"@@@ White agent: compacted history of ctx_id={context.context_id}, saved ~{tokens_saved} tokens"
+            )
         response = completion(
             messages=messages,
             model="openai/gpt-4o",
@@ -0,0 +1,87 @@
+"""Microbenchmark for white agent action extraction on long, verbose replies.
+
+Compares green_agent.action_parser.extract_action with the regex-based
+extraction it replaced, on synthetic LLM outputs of 100 KB and more.
+
+    python benchmarks/action_parser_bench.py
+"""
+import json
+import os
+import re
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from green_agent.action_parser import extract_action
+
+ACTION = {"name": "respond_to_user", "kwargs": {"message": "Your flight is booked.\nConfirmation: 4821"}}
+
+PROSE = (
+    "Let me think about this step by step. The user wants a flight to Los Angeles "
+    "on 2025-11-01, so I should look at the search results, e.g. {\"id\": 101, ...}, "
+    "and check the policy before booking.\n"
+)
+
+
+def legacy_extract(response_text):
+    """The regex extraction GreenAgent used before action_parser."""
+    json_match = re.search(r'<json>(.*?)</json>', response_text, re.DOTALL)
+    if json_match:
+        json_str = json_match.group(1).strip()
+        try:
+            return json.loads(json_str)
+        except json.JSONDecodeError:
+            fixed_str = re.sub(r'(?<!\\)\n', r'\\n', json_str)
+            return json.loads(fixed_str)
+
+    try:
+        return json.loads(response_text.strip())
+    except json.JSONDecodeError:
+        json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
+        if json_match:
+            json_str = json_match.group(0)
+            try:
+                return json.loads(json_str)
+            except json.JSONDecodeError:
+                fixed_str = re.sub(r'(?<!\\)\n', r'\\n', json_str)
+                return json.loads(fixed_str)
+        raise
+
+
+def raw_newline_action() -> str:
+    return '{"name": "respond_to_user", "kwargs": {"message": "Your flight is booked.\nConfirmation: 4821"}}'
+
+
+def make_cases(size: int):
+    prose = (PROSE * (size // len(PROSE) + 1))[:size]
+    return {
+        "tagged, prose first": f"{prose}<json>{json.dumps(ACTION)}</json>",
+        "tagged, trailing prose": f"<json>{json.dumps(ACTION)}</json>{prose}",
+        "untagged, prose first": f"Here you go.\n{raw_newline_action()}\n{prose}",
+        "tagged, raw newlines": f"{prose}<json>\n{raw_newline_action()}\n</json>",
+    }
+
+
+def bench(func, text: str, number: int) -> float:
+    return min(timeit.repeat(lambda: func(text), number=number, repeat=3)) / number
+
+
+def main():
+    for size in (100_000, 1_000_000):
+        number = 20 if size <= 100_000 else 3
+        print(f"\n{size // 1000} KB replies (best of 3, per call)")
+        print(f"  {'case':<26}{'action_parser':>16}{'legacy regex':>16}")
+        for label, text in make_cases(size).items():
+            assert extract_action(text).to_dict() == ACTION, label
+            new = bench(extract_action, text, number)
+            try:
+                legacy_extract(text)
+                legacy = f"{bench(legacy_extract, text, number) * 1000:13.3f} ms"
+            except json.JSONDecodeError:
+                legacy = f"{'fails':>16}"
+            print(f"  {label:<26}{new * 1000:13.3f} ms{legacy}")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,8 @@ CREATE TABLE flights (
     available_seats INTEGER NOT NULL
 );
 
+CREATE INDEX idx_flights_destination_date ON flights (destination, departure_date);
+
 CREATE TABLE bookings (
     id INTEGER PRIMARY KEY,
     user_id INTEGER NOT NULL,
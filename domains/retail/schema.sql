@@ -16,6 +16,30 @@ CREATE TABLE products (
     description TEXT
 );
 
+CREATE INDEX idx_products_category ON products (category);
+
+-- Trigram full-text index over product names, kept in sync by triggers.
+-- Serves substring (LIKE '%x%') name searches of 3+ characters.
+CREATE VIRTUAL TABLE products_fts USING fts5(
+    name,
+    content='products',
+    content_rowid='id',
+    tokenize='trigram'
+);
+
+CREATE TRIGGER products_fts_insert AFTER INSERT ON products BEGIN
+    INSERT INTO products_fts (rowid, name) VALUES (new.id, new.name);
+END;
+
+CREATE TRIGGER products_fts_delete AFTER DELETE ON products BEGIN
+    INSERT INTO products_fts (products_fts, rowid, name) VALUES ('delete', old.id, old.name);
+END;
+
+CREATE TRIGGER products_fts_update AFTER UPDATE OF id, name ON products BEGIN
+    INSERT INTO products_fts (products_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    INSERT INTO products_fts (rowid, name) VALUES (new.id, new.name);
+END;
+
 CREATE TABLE orders (
     id INTEGER PRIMARY KEY,
     customer_id INTEGER NOT NULL,
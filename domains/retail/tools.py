@@ -28,8 +28,8 @@ TOOLS = {
         "description": "Place an order for products",
         "parameters": {
             "customer_id": {"type": "integer", "description": "ID of the customer placing the order"},
-            "product_ids": {"type": "array", "description": "List of product IDs to order"},
-            "quantities": {"type": "array", "description": "List of quantities for each product"}
+            "product_ids": {"type": "array", "items": {"type": "integer"}, "description": "List of product IDs to order"},
+            "quantities": {"type": "array", "items": {"type": "integer"}, "description": "List of quantities for each product"}
         }
     },
     "return_item": {
@@ -0,0 +1,131 @@
+import json
+import re
+from typing import Dict, Any, Optional, Tuple
+
+JSON_OPEN_TAG = "<json>"
+JSON_CLOSE_TAG = "</json>"
+
+# The only characters that change the scanner's state. Everything between
+# them is skipped by the regex engine rather than a Python loop.
+_STRUCTURAL = re.compile(r'[{}"\\]')
+
+# '<' characters checked one by one before falling back to str.find for a tag.
+# Scanning for a single character is far faster than a multi-character search
+# on long prose, which rarely contains '<' other than in the tags.
+MAX_TAG_PROBES = 16
+
+# Opening braces tried before giving up, so prose full of stray braces
+# cannot make extraction quadratic.
+MAX_OBJECT_CANDIDATES = 32
+
+
+class ToolAction:
+    """A tool call parsed from a white agent reply."""
+
+    __slots__ = ("name", "kwargs")
+
+    def __init__(self, name: Optional[str], kwargs: Dict[str, Any]):
+        self.name = name
+        self.kwargs = kwargs
+
+    @classmethod
+    def from_dict(cls, data: Any) -> "ToolAction":
+        if not isinstance(data, dict):
+            raise ValueError(f"Expected a JSON object, got {type(data).__name__}")
+        kwargs = data.get("kwargs", {})
+        if not isinstance(kwargs, dict):
+            raise ValueError(f"Tool kwargs must be a JSON object, got {type(kwargs).__name__}")
+        return cls(data.get("name"), kwargs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"name": self.name, "kwargs": self.kwargs}
+
+    def __repr__(self) -> str:
+        return f"ToolAction(name={self.name!r}, kwargs={self.kwargs!r})"
+
+
+def _balanced_object_end(text: str, start: int, end: int) -> int:
+    """Index just past the object opened by the '{' at start, or -1 if it never closes."""
+    depth = 0
+    in_string = False
+    skip_to = start
+    for match in _STRUCTURAL.finditer(text, start, end):
+        pos = match.start()
+        if pos < skip_to:
+            # The character after a backslash escape
+            continue
+        char = match.group()
+        if in_string:
+            if char == '\\':
+                skip_to = pos + 2
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return pos + 1
+    return -1
+
+
+def _find_tag(text: str, tag: str, start: int = 0) -> int:
+    pos = text.find('<', start)
+    for _ in range(MAX_TAG_PROBES):
+        if pos == -1 or text.startswith(tag, pos):
+            return pos
+        pos = text.find('<', pos + 1)
+    return text.find(tag, pos)
+
+
+def _json_region(text: str) -> Tuple[int, int]:
+    """The span to search: inside the first <json> block if there is one, else all of text."""
+    open_pos = _find_tag(text, JSON_OPEN_TAG)
+    if open_pos == -1:
+        return 0, len(text)
+    start = open_pos + len(JSON_OPEN_TAG)
+    close_pos = _find_tag(text, JSON_CLOSE_TAG, start)
+    return start, close_pos if close_pos != -1 else len(text)
+
+
+def extract_json_object(text: str) -> Dict[str, Any]:
+    """Find and decode the first balanced JSON object in a white agent reply.
+
+    Looks inside the first <json>...</json> block when present. Raw newlines and
+    other control characters inside strings are accepted. Raises
+    json.JSONDecodeError when no object can be decoded.
+    """
+    start, end = _json_region(text)
+    if end - start < len(text):
+        # A <json> block usually holds exactly one object; try it whole first
+        block = text[start:end].strip()
+        if block.startswith('{') and block.endswith('}'):
+            try:
+                return json.loads(block, strict=False)
+            except json.JSONDecodeError:
+                pass
+
+    brace = text.find('{', start, end)
+    last_error = None
+
+    for _ in range(MAX_OBJECT_CANDIDATES):
+        if brace == -1:
+            break
+        close = _balanced_object_end(text, brace, end)
+        if close != -1:
+            try:
+                return json.loads(text[brace:close], strict=False)
+            except json.JSONDecodeError as e:
+                last_error = e
+        brace = text.find('{', brace + 1, end)
+
+    if last_error is not None:
+        raise last_error
+    raise json.JSONDecodeError("No JSON object found", text, start)
+
+
+def extract_action(text: str) -> ToolAction:
+    """Parse the tool call in a white agent reply."""
+    return ToolAction.from_dict(extract_json_object(text))
@@ -1,18 +1,26 @@
+import asyncio
 import json
 import logging
+import queue
+import threading
 import uuid
 import re
-from typing import Dict, Any, Optional, List
-import requests
+from typing import Dict, Any, Callable, Optional, List
+import httpx
 import time
-from flask import Flask, request, jsonify
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, request, jsonify
 from dotenv import load_dotenv
 import os
 import sys
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from green_agent.environment import Environment
+from green_agent.action_parser import extract_action
+from green_agent.environment_pool import EnvironmentPool
+from green_agent.jobs import JobManager, JobStore
+from green_agent.recordings import ConversationRecordings, advance_prefix_hash
+from green_agent.white_agent_client import WhiteAgentClients
 
 logging.basicConfig(
     level=logging.INFO,
@@ -25,15 +33,80 @@ def parse_tags(str_with_tags: str) -> Dict[str, str]:
     tags = re.findall(r"<(.*?)>(.*?)</\1>", str_with_tags, re.DOTALL)
     return {tag: content.strip() for tag, content in tags}
 
+# Scenarios evaluated at the same time by run_all_scenarios. Each scenario has
+# its own context_id, which the bundled white agents keep as separate
+# conversations; set it to 1 for white agents that keep only one.
+MAX_CONCURRENT_SCENARIOS = int(os.getenv('GREEN_AGENT_MAX_CONCURRENCY', '4'))
+
+ALL_SCENARIOS = [
+    ("airline", "airline_success_1"),
+    ("airline", "airline_failure_1"),
+    ("airline", "airline_success_2"),
+    ("airline", "airline_failure_2"),
+    ("airline", "airline_success_3"),
+    ("retail", "retail_success_1"),
+    ("retail", "retail_failure_1"),
+    ("retail", "retail_success_2"),
+    ("retail", "retail_failure_2"),
+    ("retail", "retail_success_3")
+]
+
+
+# Called with a dict for each progress event (a finished turn or scenario).
+EventCallback = Callable[[Dict[str, Any]], None]
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def _task_context_id(context_id: Optional[str], index: int) -> Optional[str]:
+    return f"{context_id}-{index}" if context_id else None
+
+
+class EvaluationContext:
+    """Per-scenario state of a single evaluation run.
+    
+    Every evaluation gets its own context, so several can run on one
+    GreenAgent at the same time.
+    """
+    
+    def __init__(self, domain: str, scenario: Dict[str, Any], white_agent_url: str, context_id: Optional[str] = None,
+                 on_turn: Optional[EventCallback] = None):
+        self.domain = domain
+        self.scenario = scenario
+        self.scenario_id = scenario['id']
+        self.white_agent_url = white_agent_url
+        self.context_id = context_id or str(uuid.uuid4())
+        self.on_turn = on_turn
+        self.env = None
+        # Hash of every message sent to the white agent so far, for recordings
+        self.prefix_hash = ""
+    
+    def advance_prefix(self, message: str) -> str:
+        self.prefix_hash = advance_prefix_hash(self.prefix_hash, message)
+        return self.prefix_hash
+
+
 class GreenAgent:
     
-    def __init__(self, domains_path: str):
+    def __init__(self, domains_path: str, max_concurrency: int = MAX_CONCURRENT_SCENARIOS):
         self.domains_path = domains_path
-        self.current_env = None
-        self.white_agent_url = None
-        self.scenario = None
         self.max_turns = 20
-        self.context_id = None
+        self.max_concurrency = max(1, max_concurrency)
+        self.env_pool = EnvironmentPool(domains_path)
+        self.white_agent_clients = WhiteAgentClients()
+        self.recordings = ConversationRecordings.from_env()
+        # Requests in flight, so a retired agent closes only once they finish
+        self._active = 0
+        self._retired = False
+        self._closed = False
+        self._lifecycle_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
         
     def get_agent_card(self) -> Dict[str, Any]:
         return {
@@ -43,7 +116,7 @@ class GreenAgent:
             "version": "1.0.0",
             "url": os.getenv("AGENT_PUBLIC_URL") or f"http://{os.getenv('HOST', '127.0.0.1')}:{int(os.getenv('AGENT_PORT', '8001'))}",
             "capabilities": {
-                "streaming": False,
+                "streaming": True,
                 "pushNotifications": False
             },
             "defaultInputModes": ["text"],
@@ -80,13 +153,7 @@ You should use the following env configuration:
             "contact": "agentbeats@berkeley.edu"
         }
     
-    def start_evaluation(self, domain: str, scenario_id: str, white_agent_url: str, context_id: Optional[str] = None) -> Dict[str, Any]:
-        self.white_agent_url = white_agent_url
-        self.scenario = scenario_id
-        self.context_id = context_id or str(uuid.uuid4())
-        
-        logger.info(f"Starting evaluation: domain={domain}, scenario={scenario_id}, context_id={self.context_id}")
-        
+    def _load_scenario(self, domain: str, scenario_id: str) -> Optional[Dict[str, Any]]:
         scenario_path = os.path.join(
             os.path.dirname(self.domains_path), 
             "test_cases", 
@@ -96,29 +163,82 @@ You should use the following env configuration:
         with open(scenario_path, 'r') as f:
             scenarios = json.load(f)
         
-        scenario = next((s for s in scenarios if s['id'] == scenario_id), None)
+        return next((s for s in scenarios if s['id'] == scenario_id), None)
+    
+    def _prepare_evaluation(self, domain: str, scenario_id: str, white_agent_url: str, context_id: Optional[str],
+                            on_turn: Optional[EventCallback] = None):
+        """Build the context for one evaluation. Returns (ctx, error_result)."""
+        logger.info(f"Starting evaluation: domain={domain}, scenario={scenario_id}, context_id={context_id}")
+        
+        scenario = self._load_scenario(domain, scenario_id)
         if not scenario:
             logger.error(f"Scenario {scenario_id} not found")
-            return {"error": f"Scenario {scenario_id} not found"}
+            return None, {"error": f"Scenario {scenario_id} not found"}
         
         logger.info(f"Loaded scenario: {scenario.get('description')}")
         
-        domain_path = os.path.join(self.domains_path, domain)
-        self.current_env = Environment(domain, domain_path)
+        ctx = EvaluationContext(domain, scenario, white_agent_url, context_id, on_turn)
+        ctx.env = self.env_pool.acquire(domain)
         
-        if not self.current_env.validate_setup():
+        if not ctx.env:
             logger.error("Environment validation failed")
-            return {"error": "Environment validation failed"}
+            return None, {"error": "Environment validation failed"}
         
         if 'initial_state' in scenario:
-            self._set_initial_state(scenario['initial_state'])
+            try:
+                self._set_initial_state(ctx, scenario['initial_state'])
+            except Exception:
+                self.env_pool.release(ctx.env)
+                raise
         
-        start_time = time.time()
-        result = self._run_conversation(scenario)
-        end_time = time.time()
+        ctx.env.start_change_tracking()
+        return ctx, None
+    
+    def start_evaluation(self, domain: str, scenario_id: str, white_agent_url: str, context_id: Optional[str] = None,
+                         on_turn: Optional[EventCallback] = None) -> Dict[str, Any]:
+        ctx, error = self._prepare_evaluation(domain, scenario_id, white_agent_url, context_id, on_turn)
+        if error:
+            return error
+        
+        try:
+            start_time = time.time()
+            result = self._run_conversation(ctx)
+            end_time = time.time()
+            return self._finish_evaluation(ctx, result, end_time - start_time)
+        finally:
+            self.env_pool.release(ctx.env)
+    
+    async def start_evaluation_async(self, domain: str, scenario_id: str, white_agent_url: str, context_id: Optional[str] = None,
+                                     on_turn: Optional[EventCallback] = None) -> Dict[str, Any]:
+        """asyncio counterpart of start_evaluation; white agent calls do not block a thread."""
+        ctx, error = await _to_thread_uninterrupted(
+            self._prepare_evaluation, domain, scenario_id, white_agent_url, context_id, on_turn,
+            on_cancel=self._release_prepared
+        )
+        if error:
+            return error
         
+        try:
+            start_time = time.time()
+            result = await self._run_conversation_async(ctx)
+            end_time = time.time()
+            return await _to_thread_uninterrupted(self._finish_evaluation, ctx, result, end_time - start_time)
+        finally:
+            self.env_pool.release(ctx.env)
+    
+    def _release_prepared(self, prepared):
+        ctx, _ = prepared
+        if ctx is not None:
+            self.env_pool.release(ctx.env)
+    
+    def _finish_evaluation(self, ctx: EvaluationContext, result: Dict[str, Any], time_used: float) -> Dict[str, Any]:
+        scenario = ctx.scenario
         goal_state = scenario.get('goal_state', {})
-        goal_achieved = self.current_env.evaluate_success(goal_state)
+        goal_matches = ctx.env.evaluate_goal(goal_state)
+        goal_achieved = all(
+            matches is not None and all(matches) for matches in goal_matches.values()
+        )
+        state_diff = ctx.env.get_state_diff()
         
         # expected_success indicates if this is a success or failure test case
         # Success scenarios (expected_success=True): pass when goal is achieved
@@ -133,73 +253,196 @@ You should use the following env configuration:
             # They demonstrate what happens when the agent makes mistakes
             test_passed = False
         
-        logger.info(f"Evaluation complete: goal_achieved={goal_achieved}, expected_success={expected_success}, test_passed={test_passed}, turns={result.get('turns', 0)}, time={end_time - start_time:.2f}s")
-        
-        if self.current_env:
-            self.current_env.close()
+        logger.info(f"Evaluation complete: goal_achieved={goal_achieved}, expected_success={expected_success}, test_passed={test_passed}, turns={result.get('turns', 0)}, time={time_used:.2f}s")
         
         return {
             "success": test_passed,
             "goal_achieved": goal_achieved,
+            "goal_matches": goal_matches,
+            "state_diff": state_diff,
+            "tool_cache": dict(ctx.env.tool_cache_stats),
             "expected_success": expected_success,
             "turns": result.get('turns', 0),
-            "time_used": end_time - start_time,
-            "scenario": scenario_id,
-            "domain": domain,
-            "conversation_history": self.current_env.conversation_history if self.current_env else []
+            "time_used": time_used,
+            "scenario": ctx.scenario_id,
+            "domain": ctx.domain,
+            "conversation_history": ctx.env.conversation_history
         }
     
-    def run_all_scenarios(self, white_agent_url: str) -> Dict[str, Any]:
-        """Run all predefined scenarios and return aggregated metrics."""
-        scenarios = [
-            ("airline", "airline_success_1"),
-            ("airline", "airline_failure_1"),
-            ("airline", "airline_success_2"),
-            ("airline", "airline_failure_2"),
-            ("airline", "airline_success_3"),
-            ("retail", "retail_success_1"),
-            ("retail", "retail_failure_1"),
-            ("retail", "retail_success_2"),
-            ("retail", "retail_failure_2"),
-            ("retail", "retail_success_3")
-        ]
-        
-        results = []
-        total_time = 0
-        success_count = 0
-        
-        logger.info(f"Starting batch evaluation of {len(scenarios)} scenarios")
-        
-        for domain, scenario_id in scenarios:
+    def run_all_scenarios(self, white_agent_url: str, max_concurrency: Optional[int] = None,
+                          progress: Optional[EventCallback] = None,
+                          on_turn: Optional[EventCallback] = None) -> Dict[str, Any]:
+        """Run all predefined scenarios concurrently and return aggregated metrics.
+        
+        Up to max_concurrency scenarios (default: the agent's max_concurrency)
+        are in flight at once, each in its own EvaluationContext. progress, if
+        given, is called with each scenario summary as it finishes, and
+        on_turn with every tool call of every scenario.
+        """
+        scenarios = ALL_SCENARIOS
+        workers = max(1, max_concurrency or self.max_concurrency)
+        
+        logger.info(f"Starting batch evaluation of {len(scenarios)} scenarios with {workers} workers")
+        
+        def run_one(item):
+            domain, scenario_id = item
             logger.info(f"Running scenario: {domain}/{scenario_id}")
-            
             try:
-                result = self.start_evaluation(domain, scenario_id, white_agent_url)
-                
-                if result.get('success'):
-                    success_count += 1
-                
-                total_time += result.get('time_used', 0)
-                
-                results.append({
-                    "domain": domain,
-                    "scenario": scenario_id,
-                    "success": result.get('success'),
-                    "time_used": result.get('time_used'),
-                    "turns": result.get('turns')
-                })
-                
+                summary = self._scenario_summary(domain, scenario_id, self.start_evaluation(domain, scenario_id, white_agent_url, on_turn=on_turn))
             except Exception as e:
                 logger.error(f"Failed scenario {domain}/{scenario_id}: {e}")
-                results.append({
-                    "domain": domain,
-                    "scenario": scenario_id,
-                    "success": False,
-                    "error": str(e)
-                })
+                summary = self._scenario_error(domain, scenario_id, e)
+            if progress:
+                progress(summary)
+            return summary
         
-        success_rate = success_count / len(scenarios) if scenarios else 0
-        avg_time = total_time / len(scenarios) if scenarios else 0
+        wall_start = time.time()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scenario") as executor:
+            results = list(executor.map(run_one, scenarios))
+        
+        return self._aggregate_batch(results, time.time() - wall_start)
+    
+    async def run_all_scenarios_async(self, white_agent_url: str, max_concurrency: Optional[int] = None,
+                                      progress: Optional[EventCallback] = None,
+                                      on_turn: Optional[EventCallback] = None) -> Dict[str, Any]:
+        """asyncio counterpart of run_all_scenarios, bounded by a semaphore instead of threads."""
+        scenarios = ALL_SCENARIOS
+        limit = asyncio.Semaphore(max(1, max_concurrency or self.max_concurrency))
+        
+        logger.info(f"Starting async batch evaluation of {len(scenarios)} scenarios")
+        
+        async def run_one(domain, scenario_id):
+            async with limit:
+                logger.info(f"Running scenario: {domain}/{scenario_id}")
+                try:
+                    result = await self.start_evaluation_async(domain, scenario_id, white_agent_url, on_turn=on_turn)
+                    summary = self._scenario_summary(domain, scenario_id, result)
+                except Exception as e:
+                    logger.error(f"Failed scenario {domain}/{scenario_id}: {e}")
+                    summary = self._scenario_error(domain, scenario_id, e)
+                if progress:
+                    progress(summary)
+                return summary
+        
+        wall_start = time.time()
+        results = await asyncio.gather(*(run_one(domain, scenario_id) for domain, scenario_id in scenarios))
+        
+        return self._aggregate_batch(list(results), time.time() - wall_start)
+    
+    def run_tasks(self, domain: str, scenario_ids: List[str], white_agent_url: str, context_id: Optional[str] = None,
+                  max_concurrency: Optional[int] = None, details: bool = False,
+                  progress: Optional[EventCallback] = None,
+                  on_turn: Optional[EventCallback] = None) -> Dict[str, Any]:
+        """Run the scenarios of an env_config concurrently and aggregate their metrics.
+        
+        Per-task results are only included when details is set. Each task gets
+        its own context id so the white agent can tell the conversations apart.
+        """
+        workers = max(1, max_concurrency or self.max_concurrency)
+        logger.info(f"Running {len(scenario_ids)} tasks in {domain} with {workers} workers")
+        
+        def run_one(item):
+            index, scenario_id = item
+            logger.info(f"Running task (scenario: {scenario_id})")
+            try:
+                result = self.start_evaluation(domain, scenario_id, white_agent_url, _task_context_id(context_id, index), on_turn)
+            except Exception as e:
+                logger.error(f"Failed task {domain}/{scenario_id}: {e}")
+                result = self._scenario_error(domain, scenario_id, e)
+            if progress:
+                progress(result)
+            return result
+        
+        wall_start = time.time()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="task") as executor:
+            results = list(executor.map(run_one, enumerate(scenario_ids)))
+        
+        return self._aggregate_tasks(results, time.time() - wall_start, details)
+    
+    async def run_tasks_async(self, domain: str, scenario_ids: List[str], white_agent_url: str, context_id: Optional[str] = None,
+                              max_concurrency: Optional[int] = None, details: bool = False,
+                              progress: Optional[EventCallback] = None,
+                              on_turn: Optional[EventCallback] = None) -> Dict[str, Any]:
+        """asyncio counterpart of run_tasks."""
+        limit = asyncio.Semaphore(max(1, max_concurrency or self.max_concurrency))
+        
+        async def run_one(index, scenario_id):
+            async with limit:
+                logger.info(f"Running task (scenario: {scenario_id})")
+                try:
+                    result = await self.start_evaluation_async(
+                        domain, scenario_id, white_agent_url, _task_context_id(context_id, index), on_turn
+                    )
+                except Exception as e:
+                    logger.error(f"Failed task {domain}/{scenario_id}: {e}")
+                    result = self._scenario_error(domain, scenario_id, e)
+                if progress:
+                    progress(result)
+                return result
+        
+        wall_start = time.time()
+        results = await asyncio.gather(*(run_one(index, scenario_id) for index, scenario_id in enumerate(scenario_ids)))
+        
+        return self._aggregate_tasks(list(results), time.time() - wall_start, details)
+    
+    def _aggregate_tasks(self, results: List[Dict[str, Any]], wall_time: float, details: bool) -> Dict[str, Any]:
+        success_count = sum(1 for result in results if result.get('success'))
+        # Tasks that failed before their conversation ran (unknown scenario,
+        # invalid environment, exceptions) have no timing and are counted as errors
+        completed = [result for result in results if result.get('time_used') is not None]
+        latencies = sorted(result['time_used'] for result in completed)
+        turns = [result.get('turns') or 0 for result in completed]
+        
+        aggregate = {
+            "success_rate": success_count / len(results) if results else 0,
+            "success_count": success_count,
+            "total_tasks": len(results),
+            "error_count": len(results) - len(completed),
+            "latency": {
+                "mean": sum(latencies) / len(latencies) if latencies else 0,
+                "p50": _percentile(latencies, 50),
+                "p90": _percentile(latencies, 90),
+                "p99": _percentile(latencies, 99),
+                "max": latencies[-1] if latencies else 0
+            },
+            "turns": {
+                "mean": sum(turns) / len(turns) if turns else 0,
+                "max": max(turns) if turns else 0,
+                "total": sum(turns)
+            },
+            "wall_time": wall_time
+        }
+        
+        logger.info(f"Task evaluation complete. Success rate: {aggregate['success_rate']:.2%}")
+        
+        response = {"aggregate_metrics": aggregate}
+        if details:
+            response["tasks"] = results
+        return response
+    
+    def _scenario_summary(self, domain: str, scenario_id: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "domain": domain,
+            "scenario": scenario_id,
+            "success": result.get('success'),
+            "time_used": result.get('time_used'),
+            "turns": result.get('turns')
+        }
+    
+    def _scenario_error(self, domain: str, scenario_id: str, error: Exception) -> Dict[str, Any]:
+        return {
+            "domain": domain,
+            "scenario": scenario_id,
+            "success": False,
+            "error": str(error)
+        }
+    
+    def _aggregate_batch(self, results: List[Dict[str, Any]], wall_time: float) -> Dict[str, Any]:
+        success_count = sum(1 for result in results if result.get('success'))
+        total_time = sum(result.get('time_used') or 0 for result in results)
+        
+        success_rate = success_count / len(results) if results else 0
+        avg_time = total_time / len(results) if results else 0
         
         logger.info(f"Batch evaluation complete. Success rate: {success_rate:.2%}")
         
@@ -207,51 +450,31 @@ You should use the following env configuration:
             "aggregate_metrics": {
                 "success_rate": success_rate,
                 "success_count": success_count,
-                "total_scenarios": len(scenarios),
+                "total_scenarios": len(results),
                 "average_time": avg_time,
-                "total_time": total_time
+                "total_time": total_time,
+                "wall_time": wall_time
             },
             "individual_results": results
         }
     
-    def _set_initial_state(self, initial_state: Dict[str, Any]):
-        if self.current_env:
-            self.current_env.reset_to_state(initial_state)
-    
-    def _extract_json_from_response(self, response_text: str) -> Dict[str, Any]:
-        """Extract JSON from response, handling <json>...</json> tags."""
-        json_match = re.search(r'<json>(.*?)</json>', response_text, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(1).strip()
-            # Handle newlines inside JSON strings by properly escaping them
-            # Replace literal newlines with escaped newlines for JSON parsing
-            try:
-                return json.loads(json_str)
-            except json.JSONDecodeError:
-                # Try to fix common issues with newlines in strings
-                # This handles cases where Claude puts actual newlines in message content
-                fixed_str = re.sub(r'(?<!\\)\n', r'\\n', json_str)
-                return json.loads(fixed_str)
-        
-        try:
-            return json.loads(response_text.strip())
-        except json.JSONDecodeError:
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0)
-                try:
-                    return json.loads(json_str)
-                except json.JSONDecodeError:
-                    fixed_str = re.sub(r'(?<!\\)\n', r'\\n', json_str)
-                    return json.loads(fixed_str)
-            raise
+    def _set_initial_state(self, ctx: EvaluationContext, initial_state: Dict[str, Any]):
+        if ctx.env:
+            ctx.env.reset_to_state(initial_state)
     
-    def _run_conversation(self, scenario: Dict[str, Any]) -> Dict[str, Any]:
-        user_goal = scenario.get('user_goal', '')
+    def _conversation_steps(self, ctx: EvaluationContext):
+        """The conversation with the white agent, without any I/O.
+        
+        A generator that yields each message for the white agent and expects
+        the reply to be sent back in (or the send error thrown in). It returns
+        the conversation result, so the blocking and asyncio drivers share
+        every rule of the conversation.
+        """
+        user_goal = ctx.scenario.get('user_goal', '')
         
         try:
-            initial_message = self._create_initial_message(user_goal)
-            response = self._send_to_white_agent(initial_message)
+            initial_message = self._create_initial_message(ctx, user_goal)
+            response = yield initial_message
         except Exception as e:
             logger.error(f"Failed to send initial message: {e}")
             return {"error": f"Failed to start conversation: {e}", "turns": 0}
@@ -264,19 +487,21 @@ You should use the following env configuration:
             logger.debug(f"Turn {turns}/{self.max_turns}")
             
             try:
-                response_data = self._extract_json_from_response(response)
-                tool_name = response_data.get('name')
-                tool_kwargs = response_data.get('kwargs', {})
+                action = extract_action(response)
+                tool_name = action.name
+                tool_kwargs = action.kwargs
                 
                 logger.debug(f"White agent called tool: {tool_name}")
                 
                 if tool_name == 'respond_to_user':
                     conversation_complete = True
-                    result = self.current_env.execute_tool(tool_name, **tool_kwargs)
+                    result = ctx.env.execute_tool(tool_name, **tool_kwargs)
+                    self._report_turn(ctx, turns, tool_name, tool_kwargs, result)
                     logger.info(f"Conversation completed in {turns} turns")
                 else:
-                    result = self.current_env.execute_tool(tool_name, **tool_kwargs)
-                    response = self._send_tool_result_to_white_agent(result)
+                    result = ctx.env.execute_tool(tool_name, **tool_kwargs)
+                    self._report_turn(ctx, turns, tool_name, tool_kwargs, result)
+                    response = yield self._format_tool_result(result)
                     
             except json.JSONDecodeError as e:
                 logger.error(f"Invalid JSON response from white agent: {e}")
@@ -291,17 +516,48 @@ You should use the following env configuration:
         
         return {"turns": turns, "completed": conversation_complete}
     
-    def _create_initial_message(self, user_goal: str) -> str:
-        tools_info = []
-        for tool_name, tool_info in self.current_env.tools.items():
-            tools_info.append({
-                "name": tool_name,
-                "description": tool_info["description"],
-                "parameters": tool_info["parameters"]
+    def _report_turn(self, ctx: EvaluationContext, turn: int, tool_name: str, tool_kwargs: Dict[str, Any], result: Any):
+        if ctx.on_turn:
+            ctx.on_turn({
+                "domain": ctx.domain,
+                "scenario": ctx.scenario_id,
+                "turn": turn,
+                "tool": tool_name,
+                "kwargs": tool_kwargs,
+                "result": result
             })
-        
+    
+    def _run_conversation(self, ctx: EvaluationContext) -> Dict[str, Any]:
+        steps = self._conversation_steps(ctx)
+        try:
+            message = next(steps)
+            while True:
+                try:
+                    response = self._send_to_white_agent(ctx, message)
+                except Exception as e:
+                    message = steps.throw(e)
+                else:
+                    message = steps.send(response)
+        except StopIteration as done:
+            return done.value
+    
+    async def _run_conversation_async(self, ctx: EvaluationContext) -> Dict[str, Any]:
+        # Each step parses the reply and runs the tool's SQLite queries, so it
+        # runs on a worker thread to keep the event loop free for other evaluations
+        steps = self._conversation_steps(ctx)
+        finished, message = _resume(steps.send, None)
+        while not finished:
+            try:
+                response = await self._send_to_white_agent_async(ctx, message)
+            except Exception as e:
+                finished, message = await _to_thread_uninterrupted(_resume, steps.throw, e)
+            else:
+                finished, message = await _to_thread_uninterrupted(_resume, steps.send, response)
+        return message
+    
+    def _create_initial_message(self, ctx: EvaluationContext, user_goal: str) -> str:
         message = f"""Here's a list of tools you can use (you can use at most one tool at a time):
-{json.dumps(tools_info, indent=2)}
+{ctx.env.tools_prompt}
 
 
 
@@ -320,110 +576,112 @@ User message: {user_goal}"""
         
         return message
     
-    def _send_to_white_agent(self, message: str) -> str:
-        """Send a message to the white agent and handle both A2A and direct response formats."""
+    def _white_agent_payload(self, ctx: EvaluationContext, message: str) -> Dict[str, Any]:
+        payload = {
+            "message": message
+        }
+        
+        if ctx.context_id:
+            payload["context_id"] = ctx.context_id
+        
+        logger.debug(f"Sending to white agent: {message[:100]}...")
+        return payload
+    
+    def _parse_white_agent_response(self, response_text: str) -> str:
+        """Extract the reply text from both A2A and direct response formats."""
+        logger.debug(f"Received from white agent: {response_text[:100]}...")
+        
         try:
-            payload = {
-                "message": message
-            }
+            response_json = json.loads(response_text)
             
-            if self.context_id:
-                payload["context_id"] = self.context_id
+            if 'result' in response_json:
+                result = response_json['result']
+                if 'parts' in result and len(result['parts']) > 0:
+                    first_part = result['parts'][0]
+                    if 'text' in first_part:
+                        return first_part['text']
+                    elif 'root' in first_part and 'text' in first_part['root']:
+                        return first_part['root']['text']
             
-            logger.debug(f"Sending to white agent: {message[:100]}...")
-            
-            response = requests.post(
-                f"{self.white_agent_url}/send-message",
-                json=payload,
-                timeout=30
+            if 'message' in response_json:
+                return response_json['message']
+                
+        except json.JSONDecodeError:
+            pass
+        
+        return response_text
+    
+    def _send_to_white_agent(self, ctx: EvaluationContext, message: str) -> str:
+        """Send a message to the white agent and handle both A2A and direct response formats."""
+        prefix_hash = ctx.advance_prefix(message)
+        replayed = self.recordings.replay(prefix_hash) if self.recordings else None
+        if replayed is not None:
+            return replayed
+        
+        try:
+            response = self.white_agent_clients.post(
+                ctx.white_agent_url, "/send-message", self._white_agent_payload(ctx, message)
             )
             response.raise_for_status()
+            reply = self._parse_white_agent_response(response.text)
             
-            response_text = response.text
-            logger.debug(f"Received from white agent: {response_text[:100]}...")
-            
-            try:
-                response_json = json.loads(response_text)
-                
-                if 'result' in response_json:
-                    result = response_json['result']
-                    if 'parts' in result and len(result['parts']) > 0:
-                        first_part = result['parts'][0]
-                        if 'text' in first_part:
-                            return first_part['text']
-                        elif 'root' in first_part and 'text' in first_part['root']:
-                            return first_part['root']['text']
-                
-                if 'message' in response_json:
-                    return response_json['message']
-                    
-            except json.JSONDecodeError:
-                pass
-            
-            return response_text
-            
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Failed to communicate with white agent: {e}")
             raise Exception(f"Failed to communicate with white agent: {e}")
+        
+        if self.recordings:
+            self.recordings.record(prefix_hash, reply)
+        return reply
     
-    def _send_tool_result_to_white_agent(self, tool_result: Dict[str, Any]) -> str:
-        message = f"Tool result: {json.dumps(tool_result)}"
-        return self._send_to_white_agent(message)
-
-
-
-
-app = Flask(__name__)
-
-@app.after_request
-def after_request(response):
-    response.headers.add('Access-Control-Allow-Origin', '*')
-    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-    response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
-    return response
-
-green_agent = None
-
-
-
-
-
-@app.route('/agent-card', methods=['GET'])
-def get_agent_card():
-    return jsonify(green_agent.get_agent_card())
-
-@app.route('/.well-known/agent-card.json', methods=['GET'])
-def get_agent_card_well_known():
-    return jsonify(green_agent.get_agent_card())
-
-@app.route('/reset', methods=['POST'])
-def reset_agent():
-    """Reset the agent state - required by AgentBeats for assessments."""
-    global green_agent
-    logger.info("Agent reset requested")
-    # Reinitialize the agent
-    domains_path = os.path.join(os.path.dirname(__file__), "..", "domains")
-    green_agent = GreenAgent(domains_path)
-    return jsonify({"status": "reset", "ready": True})
-
-@app.route('/status', methods=['GET'])
-def get_status():
-    """Return agent status - required by AgentBeats for assessments."""
-    return jsonify({"status": "running", "ready": True})
-
-
-@app.route('/', methods=['GET', 'POST'])
-def root_handler():
-    if request.method == 'GET':
-        return jsonify({"status": "running", "ready": True})
+    async def _send_to_white_agent_async(self, ctx: EvaluationContext, message: str) -> str:
+        """Non-blocking _send_to_white_agent on a pooled httpx.AsyncClient."""
+        prefix_hash = ctx.advance_prefix(message)
+        replayed = self.recordings.replay(prefix_hash) if self.recordings else None
+        if replayed is not None:
+            return replayed
         
-    # Handle POST - forward to send_message logic
-    return send_message()
-
-@app.route('/send-message', methods=['POST'])
-def send_message():
-    try:
-        data = request.get_json()
+        try:
+            response = await self.white_agent_clients.post_async(
+                ctx.white_agent_url, "/send-message", self._white_agent_payload(ctx, message)
+            )
+            response.raise_for_status()
+            reply = self._parse_white_agent_response(response.text)
+            
+        except httpx.HTTPError as e:
+            logger.error(f"Failed to communicate with white agent: {e}")
+            raise Exception(f"Failed to communicate with white agent: {e}")
+        
+        if self.recordings:
+            self.recordings.record(prefix_hash, reply)
+        return reply
+    
+    def _format_tool_result(self, tool_result: Dict[str, Any]) -> str:
+        return f"Tool result: {json.dumps(tool_result)}"
+    
+    def assert_query_plans(self):
+        """Startup check: raise if a domain's tool queries fall back to full table scans."""
+        full_scans = self.env_pool.check_query_plans()
+        if full_scans:
+            raise RuntimeError(f"Tool queries fall back to full table scans: {full_scans}")
+    
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "environment_pool": self.env_pool.stats(),
+            "white_agent_connections": self.white_agent_clients.stats(),
+            "recordings": self.recordings.get_stats() if self.recordings else None
+        }
+    
+    def close(self):
+        self.env_pool.close()
+        self.white_agent_clients.close()
+        if self.recordings:
+            self.recordings.close()
+    
+    async def aclose(self):
+        await self.white_agent_clients.aclose()
+    
+    def parse_request(self, data: Dict[str, Any]) -> "EvaluationRequest":
+        """Work out what an incoming /send-message body asks for."""
         logger.info(f"Received data keys: {list(data.keys())}")
         
         # Handle JSON-RPC style wrapper if present
@@ -450,6 +708,9 @@ def send_message():
         
         logger.info(f"Received message: {message[:200]}...")
         
+        # Evaluations asked to run in the background reply with a task id at once
+        background = bool(data.get('async')) or "--async" in message
+        
         # Check for AgentBeats XML tags format
         tags = parse_tags(message)
         if "white_agent_url" in tags and "env_config" in tags:
@@ -459,44 +720,41 @@ def send_message():
             domain = env_config.get("env", "retail")
             task_ids = env_config.get("task_ids", [0])
             
+            if env_config.get("max_concurrency") is not None:
+                try:
+                    env_config["max_concurrency"] = int(env_config["max_concurrency"])
+                except (TypeError, ValueError):
+                    env_config["max_concurrency"] = 0
+                if env_config["max_concurrency"] < 1:
+                    return EvaluationRequest(
+                        "invalid", context_id, error="env_config max_concurrency must be a positive integer"
+                    )
+            
             # Load scenarios for the domain
             scenario_path = os.path.join(
-                os.path.dirname(green_agent.domains_path), 
+                os.path.dirname(self.domains_path), 
                 "test_cases", 
                 f"{domain}_scenarios.json"
             )
             
             if not os.path.exists(scenario_path):
-                return jsonify({"error": f"Unknown domain: {domain}"}), 400
+                return EvaluationRequest("invalid", context_id, error=f"Unknown domain: {domain}")
                 
             with open(scenario_path, 'r') as f:
                 scenarios = json.load(f)
             
-            results = []
+            scenario_ids = []
             for task_idx in task_ids:
                 if 0 <= task_idx < len(scenarios):
-                    scenario = scenarios[task_idx]
-                    scenario_id = scenario["id"]
-                    
-                    # Run evaluation
-                    logger.info(f"Running task {task_idx} (scenario: {scenario_id})")
-                    result = green_agent.start_evaluation(domain, scenario_id, white_agent_url, context_id)
-                    results.append(result)
+                    scenario_ids.append(scenarios[task_idx]["id"])
                 else:
                     logger.warning(f"Task index {task_idx} out of range for domain {domain}")
             
-            # Format response for AgentBeats
-            if not results:
-                return _create_a2a_response("❌ Error: No valid tasks executed", context_id)
-                
-            # Aggregate results (using the last one for main status, similar to reference)
-            last_result = results[-1]
-            success = last_result.get("success", False)
-            result_emoji = "✅" if success else "❌"
-            
-            response_text = f"Finished. White agent success: {result_emoji}\nMetrics: {json.dumps(last_result)}\n"
-            return _create_a2a_response(response_text, context_id)
-
+            return EvaluationRequest(
+                "tasks", context_id, white_agent_url=white_agent_url,
+                domain=domain, scenario_ids=scenario_ids, env_config=env_config,
+                background=background
+            )
         
         if "Run all scenarios" in message or "--all" in message:
             white_agent_url = None
@@ -510,10 +768,9 @@ def send_message():
                 if "white_agent_url" in tags:
                     white_agent_url = tags["white_agent_url"]
                 else:
-                    return _create_a2a_response("❌ Error: White agent URL not found", context_id)
+                    return EvaluationRequest("reply", context_id, text="❌ Error: White agent URL not found")
             
-            results = green_agent.run_all_scenarios(white_agent_url)
-            return _create_a2a_response(f"Batch run complete. Results: {json.dumps(results)}", context_id)
+            return EvaluationRequest("all", context_id, white_agent_url=white_agent_url, background=background)
             
         elif "Run tau-bench evaluation" in message:
             # Parse domain and scenario keys
@@ -534,20 +791,315 @@ def send_message():
                     white_agent_url = line.split("White agent URL:")[1].strip()
                     break
             
-            result = green_agent.start_evaluation(domain, scenario, white_agent_url, context_id)
-            return _create_a2a_response(f"Run complete. Result: {json.dumps(result)}", context_id)
+            return EvaluationRequest(
+                "single", context_id, white_agent_url=white_agent_url,
+                domain=domain, scenario_ids=[scenario], background=background
+            )
             
         else:
-            return _create_a2a_response("❌ Error: Unknown message format. Expected 'Run tau-bench evaluation' or 'Run all scenarios'", context_id)
-            
-    except Exception as e:
-        logger.error(f"Error processing message: {e}", exc_info=True)
-        # CRITICAL: Return A2A compliant error response instead of 500 to prevent client crash
-        return _create_a2a_response(f"❌ Internal Agent Error: {str(e)}", context_id)
+            return EvaluationRequest(
+                "reply", context_id,
+                text="❌ Error: Unknown message format. Expected 'Run tau-bench evaluation' or 'Run all scenarios'"
+            )
+    
+    def _begin_request(self):
+        with self._lifecycle_lock:
+            if self._closed:
+                raise RuntimeError("Green agent has been reset")
+            self._active += 1
+    
+    def _end_request(self) -> bool:
+        """Returns True when the caller finished the last request of a retired agent and must close it."""
+        with self._lifecycle_lock:
+            self._active -= 1
+            if self._retired and self._active == 0 and not self._closed:
+                self._closed = True
+                return True
+            return False
+    
+    def retire(self):
+        """Close once the requests still in flight have finished.
+        
+        Used when /reset replaces the agent while background jobs or streams
+        may still be evaluating on it.
+        """
+        with self._lifecycle_lock:
+            self._retired = True
+            if self._active or self._closed:
+                return
+            self._closed = True
+        self._close_all()
+    
+    def _close_all(self):
+        self.close()
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            # Async clients belong to the event loop that created them
+            asyncio.run_coroutine_threadsafe(self.aclose(), loop)
+    
+    def run_request(self, req: "EvaluationRequest", progress: Optional[EventCallback] = None,
+                    on_turn: Optional[EventCallback] = None) -> Any:
+        """Run a parsed evaluation request and return its raw result.
+        
+        progress, if given, is called with each scenario result as it finishes,
+        and on_turn with each tool call the white agent makes.
+        """
+        self._begin_request()
+        try:
+            return self._run_request(req, progress, on_turn)
+        finally:
+            if self._end_request():
+                self._close_all()
+    
+    def _run_request(self, req: "EvaluationRequest", progress: Optional[EventCallback],
+                     on_turn: Optional[EventCallback]) -> Any:
+        if req.kind == "single":
+            result = self.start_evaluation(req.domain, req.scenario_ids[0], req.white_agent_url, req.context_id, on_turn)
+            if progress:
+                progress(result)
+            return result
+        
+        if req.kind == "all":
+            return self.run_all_scenarios(req.white_agent_url, progress=progress, on_turn=on_turn)
+        
+        if req.kind == "tasks":
+            return self.run_tasks(
+                req.domain, req.scenario_ids, req.white_agent_url, req.context_id,
+                max_concurrency=req.env_config.get("max_concurrency"),
+                details=bool(req.env_config.get("details")),
+                progress=progress, on_turn=on_turn
+            )
+        
+        return req.text
+    
+    async def run_request_async(self, req: "EvaluationRequest", progress: Optional[EventCallback] = None,
+                                on_turn: Optional[EventCallback] = None) -> Any:
+        """asyncio counterpart of run_request."""
+        self._loop = asyncio.get_running_loop()
+        self._begin_request()
+        try:
+            return await self._run_request_async(req, progress, on_turn)
+        finally:
+            if self._end_request():
+                await asyncio.to_thread(self.close)
+                await self.aclose()
+    
+    async def _run_request_async(self, req: "EvaluationRequest", progress: Optional[EventCallback],
+                                 on_turn: Optional[EventCallback]) -> Any:
+        if req.kind == "single":
+            result = await self.start_evaluation_async(req.domain, req.scenario_ids[0], req.white_agent_url, req.context_id, on_turn)
+            if progress:
+                progress(result)
+            return result
+        
+        if req.kind == "all":
+            return await self.run_all_scenarios_async(req.white_agent_url, progress=progress, on_turn=on_turn)
+        
+        if req.kind == "tasks":
+            return await self.run_tasks_async(
+                req.domain, req.scenario_ids, req.white_agent_url, req.context_id,
+                max_concurrency=req.env_config.get("max_concurrency"),
+                details=bool(req.env_config.get("details")),
+                progress=progress, on_turn=on_turn
+            )
+        
+        return req.text
+    
+    def handle_request(self, req: "EvaluationRequest") -> str:
+        """Run a parsed request and return the reply text."""
+        return self.format_reply(req, self.run_request(req))
+    
+    async def handle_request_async(self, req: "EvaluationRequest") -> str:
+        """asyncio counterpart of handle_request."""
+        return self.format_reply(req, await self.run_request_async(req))
+    
+    def format_reply(self, req: "EvaluationRequest", result: Any) -> str:
+        if req.kind == "single":
+            return self._format_single_reply(result)
+        if req.kind == "all":
+            return self._format_batch_reply(result)
+        if req.kind == "tasks":
+            return self._format_tasks_reply(result)
+        return result
+    
+    def _format_single_reply(self, result: Dict[str, Any]) -> str:
+        return f"Run complete. Result: {json.dumps(result)}"
+    
+    def _format_batch_reply(self, results: Dict[str, Any]) -> str:
+        return f"Batch run complete. Results: {json.dumps(results)}"
+    
+    def _format_tasks_reply(self, results: Dict[str, Any]) -> str:
+        # Format response for AgentBeats
+        metrics = results["aggregate_metrics"]
+        if not metrics["total_tasks"]:
+            return "❌ Error: No valid tasks executed"
+        
+        # The white agent succeeds when every task does
+        success = metrics["success_count"] == metrics["total_tasks"]
+        result_emoji = "✅" if success else "❌"
+        
+        return f"Finished. White agent success: {result_emoji}\nMetrics: {json.dumps(results)}\n"
 
-def _create_a2a_response(text: str, context_id: Optional[str]) -> Any:
-    """Helper to create a strictly compliant A2A SendMessageResponse."""
-    response_data = {
+
+class EvaluationRequest:
+    """A parsed /send-message request.
+    
+    kind is "single", "all" or "tasks" for evaluations, "reply" for an
+    immediate text answer and "invalid" for a request rejected with HTTP 400.
+    Evaluations with background set are run as jobs.
+    """
+    
+    def __init__(self, kind: str, context_id: Optional[str] = None, white_agent_url: Optional[str] = None,
+                 domain: Optional[str] = None, scenario_ids: Optional[List[str]] = None,
+                 env_config: Optional[Dict[str, Any]] = None, text: str = "", error: str = "",
+                 background: bool = False):
+        self.kind = kind
+        self.context_id = context_id
+        self.white_agent_url = white_agent_url
+        self.domain = domain
+        self.scenario_ids = scenario_ids or []
+        self.env_config = env_config or {}
+        self.text = text
+        self.error = error
+        self.background = background
+    
+    @property
+    def is_evaluation(self) -> bool:
+        return self.kind in ("single", "all", "tasks")
+    
+    def total_scenarios(self) -> int:
+        return len(ALL_SCENARIOS) if self.kind == "all" else len(self.scenario_ids)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "EvaluationRequest":
+        return cls(**data)
+
+
+def _resume(step: Callable[[Any], Any], value: Any):
+    """Advance a conversation generator. Returns (finished, next message or result).
+
+    StopIteration cannot cross an asyncio future, so it is turned into a flag here.
+    """
+    try:
+        return False, step(value)
+    except StopIteration as done:
+        return True, done.value
+
+
+async def _to_thread_uninterrupted(func: Callable[..., Any], *args: Any,
+                                   on_cancel: Optional[Callable[[Any], None]] = None) -> Any:
+    """asyncio.to_thread that, when cancelled, still waits for func to finish.
+
+    A worker thread cannot be interrupted, so returning at once would let the
+    caller release an Environment the thread is still using. on_cancel is
+    called with func's result before the cancellation propagates.
+    """
+    future = asyncio.ensure_future(asyncio.to_thread(func, *args))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        while not future.done():
+            try:
+                await asyncio.wait({future})
+            except asyncio.CancelledError:
+                pass
+        if on_cancel and not future.cancelled() and future.exception() is None:
+            on_cancel(future.result())
+        raise
+
+
+def submitted_reply(task_id: str) -> str:
+    return f"Evaluation submitted. Task ID: {task_id}\nPoll /tasks/{task_id} for progress and results."
+
+
+def sse_event(event: str, data: Any) -> str:
+    """One Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def is_stream_request(data: Dict[str, Any]) -> bool:
+    """A2A JSON-RPC message/stream calls are answered with an event stream."""
+    return data.get("method") == "message/stream"
+
+
+def _progress_text(event: str, item: Dict[str, Any]) -> str:
+    if event == "turn":
+        return f"{item.get('scenario')} turn {item.get('turn')}: {item.get('tool')}"
+    scenario = item.get("scenario")
+    if scenario is None:
+        # Evaluations that never started only carry their error
+        return f"Evaluation failed: {item.get('error', 'unknown error')}"
+    status = "passed" if item.get("success") else "failed"
+    return f"{scenario} {status}"
+
+
+class EventStream:
+    """Formats evaluation progress as Server-Sent Events.
+
+    The default is the plain /send-message/stream format: "turn" and "scenario"
+    events followed by a "result" event holding an A2A SendMessageResponse.
+    For A2A message/stream calls every event is instead a JSON-RPC response
+    with a Task or TaskStatusUpdateEvent result, as A2A streaming clients expect.
+    """
+
+    def __init__(self, data: Dict[str, Any], context_id: Optional[str]):
+        self.a2a = is_stream_request(data)
+        self.rpc_id = data.get("id")
+        self.context_id = context_id or str(uuid.uuid4())
+        self.task_id = str(uuid.uuid4())
+
+    def start(self) -> Optional[str]:
+        if not self.a2a:
+            return None
+        return self._rpc_event({
+            "kind": "task",
+            "id": self.task_id,
+            "contextId": self.context_id,
+            "status": {"state": "working"}
+        })
+
+    def progress(self, event: str, item: Dict[str, Any]) -> str:
+        if not self.a2a:
+            return sse_event(event, item)
+        return self._status_event("working", [
+            {"kind": "text", "text": _progress_text(event, item)},
+            {"kind": "data", "data": dict(item, event=event)}
+        ], final=False)
+
+    def result(self, text: str, failed: bool = False) -> str:
+        if not self.a2a:
+            return sse_event("result", a2a_response_data(text, self.context_id))
+        return self._status_event("failed" if failed else "completed", [{"kind": "text", "text": text}], final=True)
+
+    def _status_event(self, state: str, parts: List[Dict[str, Any]], final: bool) -> str:
+        return self._rpc_event({
+            "kind": "status-update",
+            "taskId": self.task_id,
+            "contextId": self.context_id,
+            "status": {
+                "state": state,
+                "message": {
+                    "kind": "message",
+                    "role": "agent",
+                    "messageId": str(uuid.uuid4()),
+                    "taskId": self.task_id,
+                    "contextId": self.context_id,
+                    "parts": parts
+                }
+            },
+            "final": final
+        })
+
+    def _rpc_event(self, result: Dict[str, Any]) -> str:
+        return f"data: {json.dumps({'jsonrpc': '2.0', 'id': self.rpc_id, 'result': result})}\n\n"
+
+
+def a2a_response_data(text: str, context_id: Optional[str]) -> Dict[str, Any]:
+    """A strictly compliant A2A SendMessageResponse body."""
+    return {
         "result": {
             "role": "agent",
             "parts": [{"text": text}],
@@ -555,24 +1107,169 @@ def _create_a2a_response(text: str, context_id: Optional[str]) -> Any:
             "context_id": context_id or str(uuid.uuid4())
         }
     }
-    return jsonify(response_data)
 
 
 
 
-def main():
+app = Flask(__name__)
+
+@app.after_request
+def after_request(response):
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+    response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
+    return response
+
+green_agent = None
+job_manager = None
+
+
+
+
+
+@app.route('/agent-card', methods=['GET'])
+def get_agent_card():
+    return jsonify(green_agent.get_agent_card())
+
+@app.route('/.well-known/agent-card.json', methods=['GET'])
+def get_agent_card_well_known():
+    return jsonify(green_agent.get_agent_card())
+
+@app.route('/reset', methods=['POST'])
+def reset_agent():
+    """Reset the agent state - required by AgentBeats for assessments."""
     global green_agent
+    logger.info("Agent reset requested")
+    # Reinitialize the agent; the old one closes once its in-flight requests finish
+    if green_agent:
+        green_agent.retire()
+    domains_path = os.path.join(os.path.dirname(__file__), "..", "domains")
+    green_agent = GreenAgent(domains_path)
+    return jsonify({"status": "reset", "ready": True})
+
+@app.route('/status', methods=['GET'])
+def get_status():
+    """Return agent status - required by AgentBeats for assessments."""
+    return jsonify({"status": "running", "ready": True})
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Environment pool and white agent connection reuse statistics."""
+    return jsonify(green_agent.metrics())
+
+@app.route('/send-message/stream', methods=['POST'])
+def send_message_stream():
+    """Like /send-message, but streams turn and scenario events as they happen."""
+    return _stream_message(request.get_json())
+
+def _stream_message(data: Dict[str, Any]) -> Any:
+    req = green_agent.parse_request(data)
+    if req.kind == "invalid":
+        return jsonify({"error": req.error}), 400
+    
+    stream = EventStream(data, req.context_id)
+    events: "queue.Queue" = queue.Queue()
+    
+    def run():
+        try:
+            result = green_agent.run_request(
+                req,
+                progress=lambda item: events.put(stream.progress("scenario", item)),
+                on_turn=lambda turn: events.put(stream.progress("turn", turn))
+            )
+            events.put(stream.result(green_agent.format_reply(req, result)))
+        except Exception as e:
+            logger.error(f"Error processing streamed message: {e}", exc_info=True)
+            events.put(stream.result(f"❌ Internal Agent Error: {str(e)}", failed=True))
+        finally:
+            events.put(None)
+    
+    start = stream.start()
+    if start:
+        events.put(start)
+    threading.Thread(target=run, name="stream", daemon=True).start()
+    
+    def generate():
+        while True:
+            item = events.get()
+            if item is None:
+                return
+            yield item
+    
+    return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+@app.route('/tasks/<task_id>', methods=['GET'])
+def get_task(task_id):
+    """Progress and results of a background evaluation job."""
+    job = job_manager.get(task_id)
+    if job is None:
+        return jsonify({"error": f"Unknown task: {task_id}"}), 404
+    return jsonify(job)
+
+@app.route('/', methods=['GET', 'POST'])
+def root_handler():
+    if request.method == 'GET':
+        return jsonify({"status": "running", "ready": True})
+        
+    # Handle POST - forward to send_message logic
+    return send_message()
+
+@app.route('/send-message', methods=['POST'])
+def send_message():
+    context_id = None
+    try:
+        data = request.get_json()
+        if is_stream_request(data):
+            return _stream_message(data)
+        
+        req = green_agent.parse_request(data)
+        context_id = req.context_id
+        
+        if req.kind == "invalid":
+            return jsonify({"error": req.error}), 400
+        
+        if req.background and req.is_evaluation:
+            task_id = job_manager.submit(req.to_dict(), req.total_scenarios())
+            return _create_a2a_response(submitted_reply(task_id), context_id)
+        
+        return _create_a2a_response(green_agent.handle_request(req), context_id)
+            
+    except Exception as e:
+        logger.error(f"Error processing message: {e}", exc_info=True)
+        # CRITICAL: Return A2A compliant error response instead of 500 to prevent client crash
+        return _create_a2a_response(f"❌ Internal Agent Error: {str(e)}", context_id)
+
+def _run_job(request_data: Dict[str, Any], progress: EventCallback) -> Any:
+    return green_agent.run_request(EvaluationRequest.from_dict(request_data), progress)
+
+def _create_a2a_response(text: str, context_id: Optional[str]) -> Any:
+    """Helper to create a strictly compliant A2A SendMessageResponse."""
+    return jsonify(a2a_response_data(text, context_id))
+
+
+
+
+def main():
+    global green_agent, job_manager
     
     domains_path = os.path.join(os.path.dirname(__file__), "..", "domains")
     
     logger.info(f"Initializing green agent with domains path: {domains_path}")
     green_agent = GreenAgent(domains_path)
+    green_agent.assert_query_plans()
+    job_manager = JobManager(JobStore(), _run_job)
+    job_manager.resume()
     
     host = os.getenv('HOST', '0.0.0.0')
     port = int(os.getenv('AGENT_PORT', '8001'))
     
     logger.info(f"Starting green agent server on {host}:{port}")
-    app.run(host=host, port=port, debug=False)
+    if os.getenv('GREEN_AGENT_SERVER', 'flask') == 'asgi':
+        from green_agent import asgi
+        asgi.run(green_agent, job_manager, host, port)
+    else:
+        app.run(host=host, port=port, debug=False)
 
 
 
@@ -0,0 +1,197 @@
+import asyncio
+import contextlib
+import logging
+import os
+from typing import Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from green_agent.agent import (
+    EvaluationRequest, EventStream, GreenAgent, a2a_response_data, is_stream_request, submitted_reply
+)
+from green_agent.jobs import JobManager, JobStore
+
+logger = logging.getLogger(__name__)
+
+# ASGI front end for the green agent. Same routes and responses as the Flask
+# app in agent.py, but evaluations run on the event loop, so a slow white agent
+# holds a coroutine rather than a worker thread.
+
+green_agent: Optional[GreenAgent] = None
+job_manager: Optional[JobManager] = None
+
+
+def _domains_path() -> str:
+    return os.path.join(os.path.dirname(__file__), "..", "domains")
+
+
+async def get_agent_card(request: Request) -> JSONResponse:
+    return JSONResponse(green_agent.get_agent_card())
+
+
+async def reset_agent(request: Request) -> JSONResponse:
+    """Reset the agent state - required by AgentBeats for assessments."""
+    global green_agent
+    logger.info("Agent reset requested")
+    if green_agent:
+        # The old agent closes once its in-flight requests finish
+        green_agent.retire()
+    green_agent = GreenAgent(_domains_path())
+    return JSONResponse({"status": "reset", "ready": True})
+
+
+async def get_status(request: Request) -> JSONResponse:
+    """Return agent status - required by AgentBeats for assessments."""
+    return JSONResponse({"status": "running", "ready": True})
+
+
+async def get_metrics(request: Request) -> JSONResponse:
+    """Environment pool and white agent connection reuse statistics."""
+    return JSONResponse(green_agent.metrics())
+
+
+async def send_message_stream(request: Request) -> Response:
+    """Like /send-message, but streams turn and scenario events as they happen."""
+    return _stream_message(await request.json())
+
+
+def _stream_message(data) -> Response:
+    req = green_agent.parse_request(data)
+    if req.kind == "invalid":
+        return JSONResponse({"error": req.error}, status_code=400)
+
+    stream = EventStream(data, req.context_id)
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+
+    def emit(event: Optional[str]):
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    async def run():
+        try:
+            result = await green_agent.run_request_async(
+                req,
+                progress=lambda item: emit(stream.progress("scenario", item)),
+                on_turn=lambda turn: emit(stream.progress("turn", turn))
+            )
+            emit(stream.result(green_agent.format_reply(req, result)))
+        except Exception as e:
+            logger.error(f"Error processing streamed message: {e}", exc_info=True)
+            emit(stream.result(f"❌ Internal Agent Error: {str(e)}", failed=True))
+        emit(None)
+
+    async def generate():
+        start = stream.start()
+        if start:
+            yield start
+        task = asyncio.create_task(run())
+        try:
+            while True:
+                item = await events.get()
+                if item is None:
+                    return
+                yield item
+        finally:
+            # The client went away: stop evaluating for it
+            task.cancel()
+
+    return StreamingResponse(generate(), media_type='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+
+async def get_task(request: Request) -> JSONResponse:
+    """Progress and results of a background evaluation job."""
+    task_id = request.path_params['task_id']
+    job = job_manager.get(task_id)
+    if job is None:
+        return JSONResponse({"error": f"Unknown task: {task_id}"}, status_code=404)
+    return JSONResponse(job)
+
+
+async def root_handler(request: Request) -> JSONResponse:
+    if request.method == 'GET':
+        return JSONResponse({"status": "running", "ready": True})
+    return await send_message(request)
+
+
+async def send_message(request: Request) -> Response:
+    context_id = None
+    try:
+        data = await request.json()
+        if is_stream_request(data):
+            return _stream_message(data)
+
+        req = green_agent.parse_request(data)
+        context_id = req.context_id
+
+        if req.kind == "invalid":
+            return JSONResponse({"error": req.error}, status_code=400)
+
+        if req.background and req.is_evaluation:
+            task_id = job_manager.submit(req.to_dict(), req.total_scenarios())
+            return JSONResponse(a2a_response_data(submitted_reply(task_id), context_id))
+
+        text = await green_agent.handle_request_async(req)
+        return JSONResponse(a2a_response_data(text, context_id))
+
+    except Exception as e:
+        logger.error(f"Error processing message: {e}", exc_info=True)
+        # Same as the Flask app: an A2A error message instead of a 500
+        return JSONResponse(a2a_response_data(f"❌ Internal Agent Error: {str(e)}", context_id))
+
+
+def _run_job(request_data, progress):
+    # Jobs run on the job manager's worker threads, so they use the blocking path
+    return green_agent.run_request(EvaluationRequest.from_dict(request_data), progress)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    global green_agent, job_manager
+    if green_agent is None:
+        green_agent = GreenAgent(_domains_path())
+        green_agent.assert_query_plans()
+    if job_manager is None:
+        job_manager = JobManager(JobStore(), _run_job)
+        job_manager.resume()
+    try:
+        yield
+    finally:
+        if green_agent:
+            await green_agent.aclose()
+
+
+app = Starlette(
+    routes=[
+        Route('/agent-card', get_agent_card, methods=['GET']),
+        Route('/.well-known/agent-card.json', get_agent_card, methods=['GET']),
+        Route('/reset', reset_agent, methods=['POST']),
+        Route('/status', get_status, methods=['GET']),
+        Route('/metrics', get_metrics, methods=['GET']),
+        Route('/send-message/stream', send_message_stream, methods=['POST']),
+        Route('/tasks/{task_id}', get_task, methods=['GET']),
+        Route('/', root_handler, methods=['GET', 'POST']),
+        Route('/send-message', send_message, methods=['POST']),
+    ],
+    middleware=[
+        Middleware(
+            CORSMiddleware,
+            allow_origins=['*'],
+            allow_headers=['Content-Type', 'Authorization'],
+            allow_methods=['GET', 'PUT', 'POST', 'DELETE', 'OPTIONS'],
+        )
+    ],
+    lifespan=lifespan,
+)
+
+
+def run(agent: GreenAgent, jobs: JobManager, host: str, port: int):
+    global green_agent, job_manager
+    green_agent = agent
+    job_manager = jobs
+    uvicorn.run(app, host=host, port=port, log_level="info")
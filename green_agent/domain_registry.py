@@ -0,0 +1,74 @@
+import importlib.util
+import json
+import logging
+import os
+import threading
+from typing import Dict, Any, Tuple
+
+from green_agent.tool_registry import ToolRegistry
+
+logger = logging.getLogger(__name__)
+
+# Files whose modification times make up a domain's version. A change to any
+# of them reloads the domain on its next lookup.
+DOMAIN_FILES = ("schema.sql", "data.csv", "tools.py", "policy.txt")
+
+
+class DomainSpec:
+    """Everything loaded from a domain directory that is shared across evaluations."""
+
+    def __init__(self, domain_path: str, version: Tuple[float, ...]):
+        self.domain_path = domain_path
+        self.version = version
+
+        tools_module = _load_tools_module(os.path.join(domain_path, "tools.py"))
+        self.tools: Dict[str, Any] = tools_module.TOOLS
+        self.tool_registry = ToolRegistry(self.tools)
+
+        with open(os.path.join(domain_path, "policy.txt"), 'r') as f:
+            self.policies = f.read()
+
+        tools_info = [
+            {
+                "name": tool_name,
+                "description": tool_info["description"],
+                "parameters": tool_info["parameters"]
+            }
+            for tool_name, tool_info in self.tools.items()
+        ]
+        self.tools_prompt = json.dumps(tools_info, indent=2)
+
+
+_domains: Dict[str, DomainSpec] = {}
+_domains_lock = threading.Lock()
+
+
+def _load_tools_module(tools_path: str):
+    spec = importlib.util.spec_from_file_location("tools", tools_path)
+    tools_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(tools_module)
+    return tools_module
+
+
+def _domain_version(domain_path: str) -> Tuple[float, ...]:
+    return tuple(
+        os.stat(os.path.join(domain_path, name)).st_mtime for name in DOMAIN_FILES
+    )
+
+
+def get_domain(domain_path: str) -> DomainSpec:
+    """Return the cached spec for a domain, reloading it if its files changed."""
+    key = os.path.abspath(domain_path)
+    version = _domain_version(key)
+
+    domain = _domains.get(key)
+    if domain is not None and domain.version == version:
+        return domain
+
+    with _domains_lock:
+        domain = _domains.get(key)
+        if domain is None or domain.version != version:
+            domain = DomainSpec(key, version)
+            _domains[key] = domain
+            logger.info(f"Loaded domain from {key}")
+    return domain
@@ -1,25 +1,298 @@
 import sqlite3
+import csv
 import json
 import os
+import hashlib
 import logging
-from typing import Dict, Any, List, Optional
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timedelta
 
+from green_agent.domain_registry import get_domain
+
 logger = logging.getLogger(__name__)
 
+# Per-process template databases, one per domain path, stored with the domain
+# version they were built from. Each is built once from schema.sql and data.csv
+# and then cloned into every new Environment.
+_template_dbs: Dict[str, Tuple[Tuple[float, ...], sqlite3.Connection]] = {}
+_template_lock = threading.RLock()
+
+# Goal values that can be bound as SQL parameters; any other value is a non-match.
+SQL_SCALAR_TYPES = (str, int, float, bytes)
+
+# Result column names per (domain path, domain version, SQL text), so tool
+# queries only read cursor.description the first time a statement runs.
+_result_columns_cache: Dict[Tuple[str, Tuple[float, ...], str], Tuple[str, ...]] = {}
+
+# SQL run by the domain tools. Lookups must be served by an index; see
+# Environment.check_query_plans.
+SEARCH_FLIGHTS_SQL = "SELECT * FROM flights WHERE destination = ? AND departure_date = ?"
+FLIGHT_BY_ID_SQL = "SELECT * FROM flights WHERE id = ?"
+TAKE_SEAT_SQL = "UPDATE flights SET available_seats = available_seats - 1 WHERE id = ?"
+BOOKING_BY_ID_SQL = "SELECT * FROM bookings WHERE id = ?"
+CANCEL_BOOKING_SQL = "UPDATE bookings SET status = 'cancelled' WHERE id = ?"
+RELEASE_SEAT_SQL = "UPDATE flights SET available_seats = available_seats + 1 WHERE id = ?"
+ORDER_BY_ID_SQL = "SELECT * FROM orders WHERE id = ?"
+ORDER_ITEM_PRODUCT_SQL = "SELECT product_id FROM order_items WHERE id = ?"
+RETURN_ORDER_ITEM_SQL = "UPDATE order_items SET quantity = quantity - 1 WHERE id = ?"
+RESTOCK_PRODUCT_SQL = "UPDATE products SET stock_quantity = stock_quantity + 1 WHERE id = ?"
+PRODUCT_STOCK_SQL = "SELECT stock_quantity FROM products WHERE id = ?"
+
+# Shortest name the products_fts trigram index can serve; shorter searches
+# fall back to a plain LIKE.
+MIN_FTS_SEARCH_LENGTH = 3
+
+
+def _search_products_query(category: Optional[str], name: Optional[str]) -> Tuple[str, List[Any]]:
+    query = "SELECT * FROM products WHERE 1=1"
+    params: List[Any] = []
+    
+    if category:
+        query += " AND category = ?"
+        params.append(category)
+    
+    if name:
+        if len(name) >= MIN_FTS_SEARCH_LENGTH:
+            query += " AND id IN (SELECT rowid FROM products_fts WHERE name LIKE ?)"
+        else:
+            query += " AND name LIKE ?"
+        params.append(f"%{name}%")
+    
+    return query, params
+
+
+def _cart_products_query(count: int) -> str:
+    placeholders = ','.join(['?' for _ in range(count)])
+    return f"SELECT id, stock_quantity, price FROM products WHERE id IN ({placeholders})"
+
+
+def _cart_stock_update_query(count: int) -> str:
+    cases = ' '.join(['WHEN ? THEN ?' for _ in range(count)])
+    placeholders = ','.join(['?' for _ in range(count)])
+    return (
+        f"UPDATE products SET stock_quantity = stock_quantity - CASE id {cases} END "
+        f"WHERE id IN ({placeholders})"
+    )
+
+
+# Tables read by each read-only tool and written by each write tool. Read-only
+# results are memoized per Environment until a write tool touches a table
+# they were read from.
+READ_ONLY_TOOLS = {
+    "search_flights": ("flights",),
+    "search_products": ("products",),
+    "check_inventory": ("products",),
+    "check_policy": (),
+}
+WRITE_TOOLS = {
+    "book_flight": ("bookings", "flights"),
+    "cancel_booking": ("bookings", "flights"),
+    "place_order": ("orders", "order_items", "products"),
+    "return_item": ("order_items", "products"),
+}
+
+# Sample invocations of every tool query, per domain, for check_query_plans.
+# Queries built at call time are sampled from every branch of their builder.
+_SHORT_PRODUCT_NAME = "x" * (MIN_FTS_SEARCH_LENGTH - 1)
+
+TOOL_QUERIES = {
+    "airline": [
+        (SEARCH_FLIGHTS_SQL, ("LAX", "2025-11-01")),
+        (FLIGHT_BY_ID_SQL, (101,)),
+        (TAKE_SEAT_SQL, (101,)),
+        (BOOKING_BY_ID_SQL, (1,)),
+        (CANCEL_BOOKING_SQL, (1,)),
+        (RELEASE_SEAT_SQL, (101,)),
+    ],
+    "retail": [
+        _search_products_query(category, name)
+        for category in (None, "Electronics")
+        for name in (None, _SHORT_PRODUCT_NAME, "laptop")
+    ] + [
+        (_cart_products_query(1), (201,)),
+        (_cart_products_query(2), (201, 202)),
+        (_cart_stock_update_query(1), (201, 1, 201)),
+        (_cart_stock_update_query(2), (201, 1, 202, 1, 201, 202)),
+        (ORDER_BY_ID_SQL, (1,)),
+        (ORDER_ITEM_PRODUCT_SQL, (1,)),
+        (RETURN_ORDER_ITEM_SQL, (1,)),
+        (RESTOCK_PRODUCT_SQL, (201,)),
+        (PRODUCT_STOCK_SQL, (201,)),
+    ],
+}
+
+# Tool queries that scan a table by design, with the reason.
+FULL_SCAN_ALLOWED = {
+    _search_products_query(None, None)[0]:
+        "search_products with no filters lists the whole catalog",
+    _search_products_query(None, _SHORT_PRODUCT_NAME)[0]:
+        "names shorter than the trigram index can serve are matched with LIKE",
+}
+
+# Rows buffered per table before they are flushed with executemany while
+# streaming data.csv.
+CSV_BATCH_SIZE = 5000
+
+# Expected goal rows checked per SELECT in evaluate_goal.
+GOAL_ROWS_PER_QUERY = 100
+
+# Keyed snapshots of fully reset databases, one per domain path, domain version
+# and initial_state.
+# Restoring a snapshot is a page-level copy, so repeated scenarios skip the
+# DELETE/INSERT work in reset_to_state entirely. Each snapshot is a full
+# in-memory copy of a database, so the cache is bounded by total size and
+# evicts the least recently used.
+MAX_SNAPSHOT_BYTES = int(float(os.getenv('ENV_SNAPSHOT_CACHE_MB', '256')) * 1024 * 1024)
+_snapshot_dbs: "OrderedDict[Tuple, Tuple[sqlite3.Connection, int]]" = OrderedDict()
+_snapshot_bytes = 0
+
+
+def _clone_template(domain_path: str, version: Tuple[float, ...], target: sqlite3.Connection):
+    """Copy the template database for a domain version into target, building it on first use.
+    
+    Lookup and copy happen under one lock hold, so a reload for a newer
+    version cannot close the template while it is being copied.
+    """
+    key = os.path.abspath(domain_path)
+    with _template_lock:
+        entry = _template_dbs.get(key)
+        if entry is None or entry[0] != version:
+            if entry is not None:
+                entry[1].close()
+            entry = (version, _build_template_db(domain_path))
+            _template_dbs[key] = entry
+            logger.info(f"Built template database for domain path: {key}")
+        _clone_database(entry[1], target)
+
+
+def _build_template_db(domain_path: str) -> sqlite3.Connection:
+    schema_path = os.path.join(domain_path, "schema.sql")
+    with open(schema_path, 'r') as f:
+        schema_sql = f.read()
+    
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    conn.executescript(schema_sql)
+    
+    data_path = os.path.join(domain_path, "data.csv")
+    _load_csv_data(conn, data_path)
+    return conn
+
+
+def _load_csv_data(conn: sqlite3.Connection, data_path: str):
+    """Stream data.csv into conn inside a single transaction.
+    
+    Each line is ``table,value,...``. Column metadata is looked up once per
+    table and rows are inserted per table with executemany, buffering at most
+    CSV_BATCH_SIZE rows per table so large datasets load in bounded memory.
+    """
+    insert_queries: Dict[str, str] = {}
+    batches: Dict[str, List[List[str]]] = {}
+    
+    with open(data_path, 'r', newline='') as f, conn:
+        for row in csv.reader(f):
+            if not row or not row[0].strip():
+                continue
+            
+            table_name = row[0].strip()
+            batch = batches.get(table_name)
+            if batch is None:
+                insert_queries[table_name] = _build_insert_query(conn, table_name)
+                batch = batches[table_name] = []
+            
+            batch.append(row[1:])
+            if len(batch) >= CSV_BATCH_SIZE:
+                conn.executemany(insert_queries[table_name], batch)
+                batch.clear()
+        
+        for table_name, batch in batches.items():
+            if batch:
+                conn.executemany(insert_queries[table_name], batch)
+
+
+def _build_insert_query(conn: sqlite3.Connection, table_name: str) -> str:
+    cursor = conn.execute(f"PRAGMA table_info({table_name})")
+    columns = [row[1] for row in cursor.fetchall()]
+    if not columns:
+        raise ValueError(f"Unknown table in data.csv: {table_name}")
+    
+    placeholders = ','.join(['?' for _ in columns])
+    return f"INSERT INTO {table_name} ({','.join(columns)}) VALUES ({placeholders})"
+
+
+def _clone_database(source: sqlite3.Connection, target: sqlite3.Connection):
+    """Copy every page of source into target using the sqlite3 backup API."""
+    with _template_lock:
+        source.backup(target)
+
+
+def _state_key(initial_state: Dict[str, Any]) -> str:
+    encoded = json.dumps(initial_state, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def _database_size(conn: sqlite3.Connection) -> int:
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return page_count * page_size
+
+
+def _restore_snapshot(key: Tuple, conn: sqlite3.Connection) -> bool:
+    """Copy a saved snapshot into conn. Returns False if no snapshot exists."""
+    with _template_lock:
+        entry = _snapshot_dbs.get(key)
+        if entry is None:
+            return False
+        _snapshot_dbs.move_to_end(key)
+        _clone_database(entry[0], conn)
+        return True
+
+
+def _save_snapshot(key: Tuple, conn: sqlite3.Connection):
+    global _snapshot_bytes
+    size = _database_size(conn)
+    if size > MAX_SNAPSHOT_BYTES:
+        return
+    
+    snapshot = sqlite3.connect(":memory:", check_same_thread=False)
+    _clone_database(conn, snapshot)
+    
+    with _template_lock:
+        previous = _snapshot_dbs.pop(key, None)
+        if previous is not None:
+            previous[0].close()
+            _snapshot_bytes -= previous[1]
+        _snapshot_dbs[key] = (snapshot, size)
+        _snapshot_bytes += size
+        while _snapshot_bytes > MAX_SNAPSHOT_BYTES:
+            _, (evicted, evicted_size) = _snapshot_dbs.popitem(last=False)
+            evicted.close()
+            _snapshot_bytes -= evicted_size
+
 
 class Environment:
     
     def __init__(self, domain: str, domain_path: str):
         self.domain = domain
         self.domain_path = domain_path
+        self._domain_key = os.path.abspath(domain_path)
         self.db_path = ":memory:"
         self.conn = None
         self.tools = {}
+        self.tools_prompt = ""
+        self.tool_registry = None
+        self._domain_version = ()
+        self._handlers = {}
         self.policies = {}
         self.conversation_history = []
         self.initial_state = {}
         self.goal_state = {}
+        self._table_columns_cache: Dict[str, Tuple[str, ...]] = {}
+        self._change_tracking = False
+        self._tool_cache: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._tool_cache_keys_by_table: Dict[str, set] = {}
+        self.tool_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
         
         self._load_domain_config()
     
@@ -62,50 +335,41 @@ class Environment:
             return False
     
     def _load_domain_config(self):
-        schema_path = os.path.join(self.domain_path, "schema.sql")
-        with open(schema_path, 'r') as f:
-            schema_sql = f.read()
-        
-        self.conn = sqlite3.connect(self.db_path)
-        self.conn.executescript(schema_sql)
-        
-        data_path = os.path.join(self.domain_path, "data.csv")
-        self._load_csv_data(data_path)
-        
-        tools_path = os.path.join(self.domain_path, "tools.py")
-        tools_module = self._load_tools_module(tools_path)
-        self.tools = tools_module.TOOLS
-        
-        policy_path = os.path.join(self.domain_path, "policy.txt")
-        with open(policy_path, 'r') as f:
-            self.policies = f.read()
-    
-    def _load_csv_data(self, data_path: str):
-        with open(data_path, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                    
-                parts = line.split(',')
-                table_name = parts[0]
-                values = parts[1:]
-                
-                cursor = self.conn.execute(f"PRAGMA table_info({table_name})")
-                columns = [row[1] for row in cursor.fetchall()]
-                
-                placeholders = ','.join(['?' for _ in values])
-                query = f"INSERT INTO {table_name} ({','.join(columns)}) VALUES ({placeholders})"
-                self.conn.execute(query, values)
-        
-        self.conn.commit()
+        # Tools, policies and the rendered tool list come from the process-wide
+        # domain registry; the database is cloned from the pre-built template
+        # instead of re-running the schema and re-parsing data.csv.
+        domain = get_domain(self.domain_path)
+        self._domain_version = domain.version
+        
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        _clone_template(self.domain_path, domain.version, self.conn)
+        
+        self.tools = domain.tools
+        self.tools_prompt = domain.tools_prompt
+        self.tool_registry = domain.tool_registry
+        self._handlers = {
+            spec.name: getattr(self, spec.handler_name)
+            for spec in self.tool_registry
+            if hasattr(self, spec.handler_name)
+        }
+        self.policies = domain.policies
     
-    def _load_tools_module(self, tools_path: str):
-        import importlib.util
-        spec = importlib.util.spec_from_file_location("tools", tools_path)
-        tools_module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(tools_module)
-        return tools_module
+    def is_current(self) -> bool:
+        """False once the domain files have changed since this Environment was built."""
+        return get_domain(self.domain_path).version == self._domain_version
+    
+    def reset(self):
+        """Return to the domain template state with no per-evaluation leftovers."""
+        self.conn.commit()
+        _clone_template(self.domain_path, self._domain_version, self.conn)
+        
+        self.conversation_history = []
+        self.initial_state = {}
+        self.goal_state = {}
+        self.clear_tool_cache()
+        self.tool_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+        if self._change_tracking:
+            self.clear_changes()
     
     def execute_tool(self, tool_name: str, **kwargs) -> Dict[str, Any]:
         self.conversation_history.append({
@@ -116,12 +380,7 @@ class Environment:
         })
         
         try:
-            if self.domain == "airline":
-                result = self._execute_airline_tool(tool_name, **kwargs)
-            elif self.domain == "retail":
-                result = self._execute_retail_tool(tool_name, **kwargs)
-            else:
-                result = {"error": f"Unknown domain: {self.domain}"}
+            result = self._dispatch_tool(tool_name, kwargs)
         except Exception as e:
             result = {"error": str(e)}
         
@@ -134,52 +393,87 @@ class Environment:
         
         return result
     
-    def _execute_airline_tool(self, tool_name: str, **kwargs) -> Dict[str, Any]:
-        if tool_name == "search_flights":
-            return self._search_flights(**kwargs)
-        elif tool_name == "book_flight":
-            return self._book_flight(**kwargs)
-        elif tool_name == "cancel_booking":
-            return self._cancel_booking(**kwargs)
-        elif tool_name == "check_policy":
-            return self._check_policy(**kwargs)
-        elif tool_name == "respond_to_user":
-            return self._respond_to_user(**kwargs)
-        else:
-            return {"error": f"Unknown tool: {tool_name}"}
-    
-    def _execute_retail_tool(self, tool_name: str, **kwargs) -> Dict[str, Any]:
-        if tool_name == "search_products":
-            return self._search_products(**kwargs)
-        elif tool_name == "place_order":
-            return self._place_order(**kwargs)
-        elif tool_name == "return_item":
-            return self._return_item(**kwargs)
-        elif tool_name == "check_inventory":
-            return self._check_inventory(**kwargs)
-        elif tool_name == "check_policy":
-            return self._check_policy(**kwargs)
-        elif tool_name == "respond_to_user":
-            return self._respond_to_user(**kwargs)
-        else:
-            return {"error": f"Unknown tool: {tool_name}"}
+    def _dispatch_tool(self, tool_name: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        spec, arguments, error = self.tool_registry.prepare_call(tool_name, kwargs)
+        if error:
+            return error
+        
+        handler = self._handlers.get(spec.name)
+        if handler is None:
+            return {"error": f"Unknown tool: {tool_name}", "error_type": "unknown_tool"}
+        
+        tables_read = READ_ONLY_TOOLS.get(spec.name)
+        if tables_read is None:
+            result = handler(**arguments)
+            self._invalidate_tool_cache(WRITE_TOOLS.get(spec.name, ()))
+            return result
+        
+        key = (spec.name, json.dumps(arguments, sort_keys=True))
+        cached = self._tool_cache.get(key)
+        if cached is not None:
+            self.tool_cache_stats["hits"] += 1
+            return cached
+        
+        self.tool_cache_stats["misses"] += 1
+        result = handler(**arguments)
+        if "error" not in result:
+            self._tool_cache[key] = result
+            for table in tables_read:
+                self._tool_cache_keys_by_table.setdefault(table, set()).add(key)
+        return result
+    
+    def _invalidate_tool_cache(self, tables):
+        for table in tables:
+            keys = self._tool_cache_keys_by_table.pop(table, None)
+            if not keys:
+                continue
+            for key in keys:
+                if self._tool_cache.pop(key, None) is not None:
+                    self.tool_cache_stats["invalidations"] += 1
+    
+    def clear_tool_cache(self):
+        self._tool_cache.clear()
+        self._tool_cache_keys_by_table.clear()
+    
+    def _result_columns(self, query: str, cursor: sqlite3.Cursor) -> Tuple[str, ...]:
+        """Column names for a statement, read from cursor.description only once per process."""
+        key = (self._domain_key, self._domain_version, query)
+        columns = _result_columns_cache.get(key)
+        if columns is None:
+            columns = tuple(col[0] for col in cursor.description)
+            _result_columns_cache[key] = columns
+        return columns
+    
+    def _query_rows(self, query: str, params: Any = ()) -> List[Dict[str, Any]]:
+        cursor = self.conn.execute(query, params)
+        rows = cursor.fetchall()
+        if not rows:
+            return []
+        
+        columns = self._result_columns(query, cursor)
+        return [dict(zip(columns, row)) for row in rows]
+    
+    def _query_row(self, query: str, params: Any = ()) -> Optional[Dict[str, Any]]:
+        cursor = self.conn.execute(query, params)
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        
+        return dict(zip(self._result_columns(query, cursor), row))
     
     def _search_flights(self, destination: str, date: str) -> Dict[str, Any]:
-        cursor = self.conn.execute(
-            "SELECT * FROM flights WHERE destination = ? AND departure_date = ?",
+        flights = self._query_rows(
+            SEARCH_FLIGHTS_SQL,
             (destination, date)
         )
-        flights = [dict(zip([col[0] for col in cursor.description], row)) for row in cursor.fetchall()]
         return {"flights": flights}
     
     def _book_flight(self, flight_id: int, user_id: int) -> Dict[str, Any]:
-        cursor = self.conn.execute("SELECT * FROM flights WHERE id = ?", (flight_id,))
-        flight = cursor.fetchone()
+        flight = self._query_row(FLIGHT_BY_ID_SQL, (flight_id,))
         if not flight:
             return {"error": "Flight not found"}
         
-        flight_dict = dict(zip([col[0] for col in cursor.description], flight))
-        if flight_dict['available_seats'] <= 0:
+        if flight['available_seats'] <= 0:
             return {"error": "No seats available"}
         
         booking_date = datetime.now().strftime("%Y-%m-%d")
@@ -190,7 +484,7 @@ class Environment:
         booking_id = cursor.lastrowid
         
         self.conn.execute(
-            "UPDATE flights SET available_seats = available_seats - 1 WHERE id = ?",
+            TAKE_SEAT_SQL,
             (flight_id,)
         )
         self.conn.commit()
@@ -198,118 +492,113 @@ class Environment:
         return {"booking_id": booking_id, "status": "confirmed"}
     
     def _cancel_booking(self, booking_id: int) -> Dict[str, Any]:
-        cursor = self.conn.execute("SELECT * FROM bookings WHERE id = ?", (booking_id,))
-        booking = cursor.fetchone()
+        booking = self._query_row(BOOKING_BY_ID_SQL, (booking_id,))
         if not booking:
             return {"error": "Booking not found"}
         
-        booking_dict = dict(zip([col[0] for col in cursor.description], booking))
-        booking_date = datetime.strptime(booking_dict['booking_date'], "%Y-%m-%d")
+        booking_date = datetime.strptime(booking['booking_date'], "%Y-%m-%d")
         days_ago = (datetime.now() - booking_date).days
         
         if days_ago > 1:
             return {"error": "Cancellation not allowed after 24 hours"}
         
         self.conn.execute(
-            "UPDATE bookings SET status = 'cancelled' WHERE id = ?",
+            CANCEL_BOOKING_SQL,
             (booking_id,)
         )
         
         self.conn.execute(
-            "UPDATE flights SET available_seats = available_seats + 1 WHERE id = ?",
-            (booking_dict['flight_id'],)
+            RELEASE_SEAT_SQL,
+            (booking['flight_id'],)
         )
         self.conn.commit()
         
         return {"status": "cancelled"}
     
     def _search_products(self, category: str = None, name: str = None) -> Dict[str, Any]:
-        query = "SELECT * FROM products WHERE 1=1"
-        params = []
-        
-        if category:
-            query += " AND category = ?"
-            params.append(category)
-        
-        if name:
-            query += " AND name LIKE ?"
-            params.append(f"%{name}%")
-        
-        cursor = self.conn.execute(query, params)
-        products = [dict(zip([col[0] for col in cursor.description], row)) for row in cursor.fetchall()]
+        query, params = _search_products_query(category, name)
+        products = self._query_rows(query, params)
         return {"products": products}
     
     def _place_order(self, customer_id: int, product_ids: List[int], quantities: List[int]) -> Dict[str, Any]:
         if len(product_ids) != len(quantities):
             return {"error": "Product IDs and quantities must match"}
         
+        # Repeated products are checked against their combined quantity
+        requested: Dict[int, int] = {}
         for product_id, quantity in zip(product_ids, quantities):
-            cursor = self.conn.execute("SELECT stock_quantity FROM products WHERE id = ?", (product_id,))
-            stock = cursor.fetchone()
-            if not stock or stock[0] < quantity:
+            requested[product_id] = requested.get(product_id, 0) + quantity
+        
+        cursor = self.conn.execute(_cart_products_query(len(requested)), list(requested))
+        products = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+        
+        for product_id in product_ids:
+            product = products.get(product_id)
+            if not product or product[0] < requested[product_id]:
                 return {"error": f"Insufficient stock for product {product_id}"}
         
         order_date = datetime.now().strftime("%Y-%m-%d")
         total_amount = 0
-        
         for product_id, quantity in zip(product_ids, quantities):
-            cursor = self.conn.execute("SELECT price FROM products WHERE id = ?", (product_id,))
-            price = cursor.fetchone()[0]
-            total_amount += price * quantity
-        
-        cursor = self.conn.execute(
-            "INSERT INTO orders (customer_id, order_date, total_amount, status) VALUES (?, ?, ?, ?)",
-            (customer_id, order_date, total_amount, "completed")
-        )
-        order_id = cursor.lastrowid
+            total_amount += products[product_id][1] * quantity
         
-        for product_id, quantity in zip(product_ids, quantities):
-            cursor = self.conn.execute("SELECT price FROM products WHERE id = ?", (product_id,))
-            unit_price = cursor.fetchone()[0]
-            
-            self.conn.execute(
-                "INSERT INTO order_items (order_id, product_id, quantity, unit_price) VALUES (?, ?, ?, ?)",
-                (order_id, product_id, quantity, unit_price)
+        # One transaction: a failure anywhere leaves no partial order behind
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO orders (customer_id, order_date, total_amount, status) VALUES (?, ?, ?, ?)",
+                (customer_id, order_date, total_amount, "completed")
             )
+            order_id = cursor.lastrowid
             
-            self.conn.execute(
-                "UPDATE products SET stock_quantity = stock_quantity - ? WHERE id = ?",
-                (quantity, product_id)
-            )
+            if requested:
+                self.conn.executemany(
+                    "INSERT INTO order_items (order_id, product_id, quantity, unit_price) VALUES (?, ?, ?, ?)",
+                    [
+                        (order_id, product_id, quantity, products[product_id][1])
+                        for product_id, quantity in zip(product_ids, quantities)
+                    ]
+                )
+                
+                params: List[int] = []
+                for product_id, quantity in requested.items():
+                    params.extend((product_id, quantity))
+                self.conn.execute(
+                    _cart_stock_update_query(len(requested)),
+                    params + list(requested)
+                )
         
-        self.conn.commit()
         return {"order_id": order_id, "status": "completed", "total_amount": total_amount}
     
     def _return_item(self, order_id: int, item_id: int, reason: str) -> Dict[str, Any]:
-        cursor = self.conn.execute("SELECT * FROM orders WHERE id = ?", (order_id,))
-        order = cursor.fetchone()
+        order = self._query_row(ORDER_BY_ID_SQL, (order_id,))
         if not order:
             return {"error": "Order not found"}
         
-        order_dict = dict(zip([col[0] for col in cursor.description], order))
-        order_date = datetime.strptime(order_dict['order_date'], "%Y-%m-%d")
+        order_date = datetime.strptime(order['order_date'], "%Y-%m-%d")
         days_ago = (datetime.now() - order_date).days
         
         if days_ago > 30:
             return {"error": "Return window expired (30 days)"}
         
-        self.conn.execute(
-            "UPDATE order_items SET quantity = quantity - 1 WHERE id = ?",
-            (item_id,)
-        )
+        cursor = self.conn.execute(ORDER_ITEM_PRODUCT_SQL, (item_id,))
+        item = cursor.fetchone()
+        if not item:
+            return {"error": "Item not found"}
         
-        cursor = self.conn.execute("SELECT product_id FROM order_items WHERE id = ?", (item_id,))
-        product_id = cursor.fetchone()[0]
-        self.conn.execute(
-            "UPDATE products SET stock_quantity = stock_quantity + 1 WHERE id = ?",
-            (product_id,)
-        )
+        with self.conn:
+            self.conn.execute(
+                RETURN_ORDER_ITEM_SQL,
+                (item_id,)
+            )
+            self.conn.execute(
+                RESTOCK_PRODUCT_SQL,
+                (item[0],)
+            )
         
-        self.conn.commit()
         return {"status": "returned", "reason": reason}
     
     def _check_inventory(self, product_id: int) -> Dict[str, Any]:
-        cursor = self.conn.execute("SELECT stock_quantity FROM products WHERE id = ?", (product_id,))
+        cursor = self.conn.execute(PRODUCT_STOCK_SQL, (product_id,))
         stock = cursor.fetchone()
         if not stock:
             return {"error": "Product not found"}
@@ -329,75 +618,272 @@ class Environment:
     def _respond_to_user(self, message: str) -> Dict[str, Any]:
         return {"message": message, "status": "sent"}
     
+    def _data_tables(self) -> List[str]:
+        """Regular tables holding domain data, excluding FTS virtual and shadow tables."""
+        cursor = self.conn.execute("""
+            SELECT t.name FROM sqlite_master t
+            WHERE t.type = 'table'
+              AND t.name NOT LIKE 'sqlite_%'
+              AND t.sql NOT LIKE 'CREATE VIRTUAL TABLE%'
+              AND NOT EXISTS (
+                  SELECT 1 FROM sqlite_master v
+                  WHERE v.type = 'table'
+                    AND v.sql LIKE 'CREATE VIRTUAL TABLE%'
+                    AND t.name LIKE v.name || '\\_%' ESCAPE '\\'
+              )
+        """)
+        return [row[0] for row in cursor.fetchall()]
+    
+    def check_query_plans(self) -> List[str]:
+        """Return the tool queries whose plan falls back to a full table scan.
+        
+        Queries in FULL_SCAN_ALLOWED are skipped.
+        """
+        full_scans = []
+        
+        for query, params in TOOL_QUERIES.get(self.domain, []):
+            if query in FULL_SCAN_ALLOWED:
+                continue
+            plan = self.conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+            for _, _, _, detail in plan:
+                if detail.startswith("SCAN ") and "VIRTUAL TABLE INDEX" not in detail:
+                    full_scans.append(f"{query} ({detail})")
+        
+        return full_scans
+    
     def get_current_state(self) -> Dict[str, Any]:
         state = {}
         
-        cursor = self.conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = [row[0] for row in cursor.fetchall()]
-        
-        for table in tables:
-            cursor = self.conn.execute(f"SELECT * FROM {table}")
-            rows = cursor.fetchall()
-            columns = [col[0] for col in cursor.description]
-            state[table] = [dict(zip(columns, row)) for row in rows]
+        for table in self._data_tables():
+            state[table] = self._query_rows(f"SELECT * FROM {table}")
         
         return state
     
-    def evaluate_success(self, goal_state: Dict[str, Any]) -> bool:
-        current_state = self.get_current_state()
+    def _table_columns(self, table: str) -> Tuple[str, ...]:
+        """Column names of a table, or an empty tuple if it does not exist."""
+        columns = self._table_columns_cache.get(table)
+        if columns is None:
+            cursor = self.conn.execute("SELECT name FROM pragma_table_info(?)", (table,))
+            columns = tuple(row[0] for row in cursor.fetchall())
+            self._table_columns_cache[table] = columns
+        return columns
+    
+    def evaluate_goal(self, goal_state: Dict[str, Any]) -> Dict[str, Optional[List[bool]]]:
+        """Match every expected row of a goal spec inside SQLite.
+        
+        Each expected row is compiled into a parameterized EXISTS subquery and
+        all rows of a table are checked in one SELECT. Returns one boolean per
+        expected row, keyed by table; tables missing from the database map to
+        None.
+        """
+        results: Dict[str, Optional[List[bool]]] = {}
         
         for table, expected_rows in goal_state.items():
-            if table not in current_state:
-                return False
+            columns = self._table_columns(table)
+            if not columns:
+                results[table] = None
+                continue
             
-            current_rows = current_state[table]
+            matches: List[bool] = []
+            for start in range(0, len(expected_rows), GOAL_ROWS_PER_QUERY):
+                chunk = expected_rows[start:start + GOAL_ROWS_PER_QUERY]
+                matches.extend(self._match_goal_rows(table, columns, chunk))
+            results[table] = matches
+        
+        return results
+    
+    def _match_goal_rows(self, table: str, columns: Tuple[str, ...],
+                         expected_rows: List[Dict[str, Any]]) -> List[bool]:
+        subqueries = []
+        params: List[Any] = []
+        
+        for expected_row in expected_rows:
+            conditions = []
+            row_params = []
+            for column, value in expected_row.items():
+                if column not in columns:
+                    # An unknown column reads as None, so only None can match it
+                    if value is None:
+                        continue
+                    conditions = None
+                    break
+                if value is not None and not isinstance(value, SQL_SCALAR_TYPES):
+                    # A list or object never equals a column value
+                    conditions = None
+                    break
+                conditions.append(f"{column} IS ?")
+                row_params.append(value)
             
-            for expected_row in expected_rows:
-                found = False
-                for current_row in current_rows:
-                    if all(current_row.get(k) == v for k, v in expected_row.items()):
-                        found = True
-                        break
-                
-                if not found:
-                    return False
+            if conditions is None:
+                subqueries.append("0")
+            else:
+                where = " AND ".join(conditions) or "1"
+                subqueries.append(f"EXISTS (SELECT 1 FROM {table} WHERE {where})")
+                params.extend(row_params)
+        
+        row = self.conn.execute(f"SELECT {', '.join(subqueries)}", params).fetchone()
+        return [bool(match) for match in row]
+    
+    def evaluate_success(self, goal_state: Dict[str, Any]) -> bool:
+        for matches in self.evaluate_goal(goal_state).values():
+            if matches is None or not all(matches):
+                return False
         
         return True
     
-    def reset_to_state(self, initial_state: Dict[str, Any]):
-        """Reset the environment to a specific initial state."""
-        try:
-            # Clear existing data
-            cursor = self.conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = [row[0] for row in cursor.fetchall()]
-            
-            for table in tables:
-                self.conn.execute(f"DELETE FROM {table}")
+    def start_change_tracking(self):
+        """Record every insert, update and delete from now on in a change log.
+        
+        Capture is done with TEMP triggers writing to a TEMP table, so neither
+        survives into the template database or the state snapshots.
+        """
+        if not self._change_tracking:
+            self.conn.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS change_log ("
+                "seq INTEGER PRIMARY KEY, tbl TEXT NOT NULL, op TEXT NOT NULL, "
+                "row_id INTEGER NOT NULL, old_row TEXT)"
+            )
+            for table in self._data_tables():
+                self._create_change_triggers(table)
+            self._change_tracking = True
+        
+        self.clear_changes()
+    
+    def _create_change_triggers(self, table: str):
+        old_row = "json_object({})".format(
+            ", ".join(f"'{column}', OLD.{column}" for column in self._table_columns(table))
+        )
+        self.conn.executescript(f"""
+            CREATE TEMP TRIGGER IF NOT EXISTS track_{table}_insert AFTER INSERT ON main.{table}
+            BEGIN
+                INSERT INTO change_log (tbl, op, row_id) VALUES ('{table}', 'insert', NEW.rowid);
+            END;
+            CREATE TEMP TRIGGER IF NOT EXISTS track_{table}_update AFTER UPDATE ON main.{table}
+            BEGIN
+                INSERT INTO change_log (tbl, op, row_id, old_row)
+                VALUES ('{table}', 'update', NEW.rowid, {old_row});
+            END;
+            CREATE TEMP TRIGGER IF NOT EXISTS track_{table}_delete AFTER DELETE ON main.{table}
+            BEGIN
+                INSERT INTO change_log (tbl, op, row_id, old_row)
+                VALUES ('{table}', 'delete', OLD.rowid, {old_row});
+            END;
+        """)
+    
+    def clear_changes(self):
+        self.conn.execute("DELETE FROM temp.change_log")
+        self.conn.commit()
+    
+    def get_changes(self) -> List[Dict[str, Any]]:
+        """Raw change log entries in the order they happened."""
+        if not self._change_tracking:
+            return []
+        
+        cursor = self.conn.execute("SELECT tbl, op, row_id FROM temp.change_log ORDER BY seq")
+        return [{"table": table, "op": op, "rowid": row_id} for table, op, row_id in cursor]
+    
+    def get_state_diff(self) -> Dict[str, Dict[str, List[Any]]]:
+        """Net per-table changes since change tracking started.
+        
+        Only rows named in the change log are read back. Each table maps to
+        ``inserted`` (current rows), ``updated`` (``{"before", "after"}`` pairs)
+        and ``deleted`` (rows as they were before the first change).
+        """
+        if not self._change_tracking:
+            return {}
+        
+        # Keep the first log entry per row: it holds the pre-evaluation values
+        first_changes: Dict[str, Dict[int, Tuple[str, Optional[str]]]] = {}
+        cursor = self.conn.execute("SELECT tbl, op, row_id, old_row FROM temp.change_log ORDER BY seq")
+        for table, op, row_id, old_row in cursor:
+            first_changes.setdefault(table, {}).setdefault(row_id, (op, old_row))
+        
+        diff = {}
+        for table, changes in first_changes.items():
+            current_rows = self._fetch_rows_by_rowid(table, list(changes))
+            table_diff = {"inserted": [], "updated": [], "deleted": []}
             
-            # Insert new data
-            for table, rows in initial_state.items():
-                if not rows:
-                    continue
-                    
-                if table not in tables:
-                    logger.warning(f"Table {table} not found in database, skipping")
-                    continue
+            for row_id, (op, old_row) in changes.items():
+                after = current_rows.get(row_id)
+                before = json.loads(old_row) if old_row else None
                 
-                # Get columns from the first row
-                columns = list(rows[0].keys())
-                placeholders = ','.join(['?' for _ in columns])
-                query = f"INSERT INTO {table} ({','.join(columns)}) VALUES ({placeholders})"
-                
-                for row in rows:
-                    values = [row[col] for col in columns]
-                    self.conn.execute(query, values)
+                if op == "insert":
+                    if after is not None:
+                        table_diff["inserted"].append(after)
+                elif after is None:
+                    table_diff["deleted"].append(before)
+                elif after != before:
+                    table_diff["updated"].append({"before": before, "after": after})
             
+            if any(table_diff.values()):
+                diff[table] = table_diff
+        
+        return diff
+    
+    def _fetch_rows_by_rowid(self, table: str, row_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        columns = self._table_columns(table)
+        rows = {}
+        for start in range(0, len(row_ids), 500):
+            chunk = row_ids[start:start + 500]
+            placeholders = ','.join(['?' for _ in chunk])
+            cursor = self.conn.execute(
+                f"SELECT rowid, {', '.join(columns)} FROM {table} WHERE rowid IN ({placeholders})",
+                chunk
+            )
+            for row in cursor:
+                rows[row[0]] = dict(zip(columns, row[1:]))
+        return rows
+    
+    def reset_to_state(self, initial_state: Dict[str, Any]):
+        """Reset the environment to a specific initial state.
+        
+        The first reset to a given initial_state builds it row by row and keeps
+        a snapshot of the result; later resets to the same state restore that
+        snapshot with a page-level copy.
+        """
+        try:
             self.conn.commit()
+            key = (self._domain_key, self._domain_version, _state_key(initial_state))
+            
+            if _restore_snapshot(key, self.conn):
+                logger.info("Environment reset to initial state from snapshot")
+                return
+            
+            self._apply_state(initial_state)
+            _save_snapshot(key, self.conn)
             logger.info("Environment reset to initial state")
             
         except Exception as e:
             logger.error(f"Failed to reset environment: {e}")
             raise
+        finally:
+            self.clear_tool_cache()
+            if self._change_tracking:
+                self.clear_changes()
+    
+    def _apply_state(self, initial_state: Dict[str, Any]):
+        # Clear existing data
+        tables = self._data_tables()
+        
+        for table in tables:
+            self.conn.execute(f"DELETE FROM {table}")
+        
+        # Insert new data
+        for table, rows in initial_state.items():
+            if not rows:
+                continue
+                
+            if table not in tables:
+                logger.warning(f"Table {table} not found in database, skipping")
+                continue
+            
+            # Get columns from the first row
+            columns = list(rows[0].keys())
+            placeholders = ','.join(['?' for _ in columns])
+            query = f"INSERT INTO {table} ({','.join(columns)}) VALUES ({placeholders})"
+            self.conn.executemany(query, ([row[col] for col in columns] for row in rows))
+        
+        self.conn.commit()
 
     def close(self):
         if self.conn:
@@ -0,0 +1,146 @@
+import logging
+import os
+import queue
+import threading
+from typing import Dict, List, Optional
+
+from green_agent.environment import Environment
+
+logger = logging.getLogger(__name__)
+
+# Ready Environments kept per domain. 0 disables pooling.
+ENV_POOL_SIZE = int(os.getenv('ENV_POOL_SIZE', '2'))
+
+_STOP = object()
+
+
+class EnvironmentPool:
+    """Keeps validated Environments per domain, already reset to the template state.
+
+    acquire() hands out a ready Environment without constructing or validating
+    one on the request path. Released environments and refills are handled by
+    a background thread, which resets them to the domain template.
+    """
+
+    def __init__(self, domains_path: str, size: int = ENV_POOL_SIZE):
+        self.domains_path = domains_path
+        self.size = size
+        self._ready: Dict[str, "queue.Queue[Environment]"] = {}
+        self._checked_out: Dict[str, int] = {}
+        self._ready_lock = threading.Lock()
+        self._closed = False
+        self._work: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="environment-pool", daemon=True)
+        self._thread.start()
+
+        for domain in self._available_domains():
+            self._work.put((domain, None))
+
+    def _available_domains(self) -> List[str]:
+        if not os.path.isdir(self.domains_path):
+            return []
+        return sorted(
+            name for name in os.listdir(self.domains_path)
+            if os.path.isfile(os.path.join(self.domains_path, name, "schema.sql"))
+        )
+
+    def _ready_queue(self, domain: str) -> "queue.Queue[Environment]":
+        with self._ready_lock:
+            ready = self._ready.get(domain)
+            if ready is None:
+                ready = self._ready[domain] = queue.Queue()
+            return ready
+
+    def _create(self, domain: str) -> Optional[Environment]:
+        env = Environment(domain, os.path.join(self.domains_path, domain))
+        if not env.validate_setup():
+            env.close()
+            return None
+        return env
+
+    def acquire(self, domain: str) -> Optional[Environment]:
+        """Check out a ready Environment, or None if one cannot be validated."""
+        try:
+            env = self._ready_queue(domain).get_nowait()
+        except queue.Empty:
+            logger.info(f"Environment pool empty for domain {domain}, creating one inline")
+            env = self._create(domain)
+            # Top up in case the pool is short rather than just all checked out
+            if self.size > 0:
+                self._work.put((domain, None))
+
+        if env is not None:
+            with self._ready_lock:
+                self._checked_out[domain] = self._checked_out.get(domain, 0) + 1
+        return env
+
+    def release(self, env: Environment):
+        """Hand an Environment back; it is reset and reused in the background."""
+        with self._ready_lock:
+            self._checked_out[env.domain] = max(0, self._checked_out.get(env.domain, 0) - 1)
+            closed = self._closed
+        if self.size > 0 and not closed:
+            self._work.put((env.domain, env))
+        else:
+            env.close()
+
+    def check_query_plans(self) -> Dict[str, List[str]]:
+        """Tool queries that fall back to a full table scan, per domain."""
+        full_scans = {}
+        for domain in self._available_domains():
+            env = Environment(domain, os.path.join(self.domains_path, domain))
+            try:
+                scans = env.check_query_plans()
+            finally:
+                env.close()
+            if scans:
+                full_scans[domain] = scans
+        return full_scans
+
+    def stats(self) -> Dict[str, int]:
+        with self._ready_lock:
+            return {domain: ready.qsize() for domain, ready in self._ready.items()}
+
+    def close(self):
+        with self._ready_lock:
+            self._closed = True
+        self._work.put(_STOP)
+        self._thread.join(timeout=5)
+        with self._ready_lock:
+            for ready in self._ready.values():
+                while not ready.empty():
+                    ready.get_nowait().close()
+
+    def _run(self):
+        while True:
+            item = self._work.get()
+            if item is _STOP:
+                return
+
+            domain, env = item
+            try:
+                ready = self._ready_queue(domain)
+                if env is not None:
+                    # Released environments are reset and reused before anything new is built
+                    if ready.qsize() >= self.size or not env.is_current():
+                        env.close()
+                    else:
+                        env.reset()
+                        ready.put(env)
+                        continue
+
+                while self._shortfall(domain) > 0:
+                    env = self._create(domain)
+                    if env is None:
+                        logger.error(f"Could not pre-warm a valid environment for domain {domain}")
+                        break
+                    ready.put(env)
+            except Exception as e:
+                logger.error(f"Environment pool refill failed for domain {domain}: {e}")
+
+    def _shortfall(self, domain: str) -> int:
+        """Environments to build so ready plus checked-out ones reach the pool size."""
+        with self._ready_lock:
+            ready = self._ready.get(domain)
+            available = ready.qsize() if ready is not None else 0
+            return self.size - available - self._checked_out.get(domain, 0)
@@ -0,0 +1,169 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Evaluation jobs run at once in the background; more wait in the queue.
+JOB_WORKERS = int(os.getenv('GREEN_AGENT_JOB_WORKERS', '2'))
+JOB_DB_PATH = os.getenv(
+    'GREEN_AGENT_JOB_DB',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "jobs.sqlite3")
+)
+
+JOB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    request TEXT NOT NULL,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL REFERENCES jobs(id),
+    seq INTEGER NOT NULL,
+    item TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+
+# A job runner gets the stored request and a callback to report each finished
+# item, and returns the job's JSON-serialisable result.
+JobRunner = Callable[[Dict[str, Any], Callable[[Dict[str, Any]], None]], Any]
+
+
+class JobStore:
+    """Evaluation jobs and their per-item progress, kept in a SQLite file."""
+
+    def __init__(self, path: str = JOB_DB_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(JOB_SCHEMA)
+        self.lock = threading.Lock()
+
+    def create(self, request: Dict[str, Any], total: int) -> str:
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO jobs (id, request, status, total, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?, ?)",
+                (job_id, json.dumps(request), total, now, now)
+            )
+        return job_id
+
+    def set_status(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+            )
+
+    def add_item(self, job_id: str, item: Dict[str, Any]):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO job_items (job_id, seq, item) "
+                "VALUES (?, (SELECT COUNT(*) FROM job_items WHERE job_id = ?), ?)",
+                (job_id, job_id, json.dumps(item))
+            )
+            self.conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT id, status, total, result, error, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            items = [
+                json.loads(item) for (item,) in self.conn.execute(
+                    "SELECT item FROM job_items WHERE job_id = ? ORDER BY seq", (job_id,)
+                )
+            ]
+
+        task_id, status, total, result, error, created_at, updated_at = row
+        return {
+            "task_id": task_id,
+            "status": status,
+            "progress": {"completed": len(items), "total": total},
+            "items": items,
+            "result": json.loads(result) if result is not None else None,
+            "error": error,
+            "created_at": created_at,
+            "updated_at": updated_at
+        }
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        """Jobs that were queued or running when the process last stopped."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, request FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [{"id": job_id, "request": json.loads(request)} for job_id, request in rows]
+
+    def restart(self, job_id: str):
+        """Drop the progress of an interrupted job so it can run again from the start."""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM job_items WHERE job_id = ?", (job_id,))
+            self.conn.execute(
+                "UPDATE jobs SET status = 'queued', updated_at = ? WHERE id = ?", (time.time(), job_id)
+            )
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class JobManager:
+    """Runs evaluation jobs on a bounded worker pool and records them in a JobStore.
+
+    submit() returns a task id straight away. Jobs still queued or running when
+    the process stopped are started again by resume().
+    """
+
+    def __init__(self, store: JobStore, runner: JobRunner, max_workers: int = JOB_WORKERS):
+        self.store = store
+        self.runner = runner
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="job")
+
+    def submit(self, request: Dict[str, Any], total: int) -> str:
+        job_id = self.store.create(request, total)
+        self.executor.submit(self._run, job_id, request)
+        logger.info(f"Queued evaluation job {job_id}")
+        return job_id
+
+    def resume(self) -> int:
+        jobs = self.store.unfinished()
+        for job in jobs:
+            self.store.restart(job["id"])
+            self.executor.submit(self._run, job["id"], job["request"])
+        if jobs:
+            logger.info(f"Resumed {len(jobs)} interrupted evaluation jobs")
+        return len(jobs)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    def _run(self, job_id: str, request: Dict[str, Any]):
+        self.store.set_status(job_id, "running")
+        try:
+            result = self.runner(request, lambda item: self.store.add_item(job_id, item))
+        except Exception as e:
+            logger.error(f"Evaluation job {job_id} failed: {e}", exc_info=True)
+            self.store.set_status(job_id, "failed", error=str(e))
+        else:
+            self.store.set_status(job_id, "completed", result=result)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.store.close()
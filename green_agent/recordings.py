@@ -0,0 +1,100 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# "record" stores every white agent reply, "replay" serves stored replies
+# without contacting the white agent. Anything else turns recording off.
+RECORDING_MODE = os.getenv('WHITE_AGENT_RECORDING', '').lower()
+RECORDING_PATH = os.getenv(
+    'WHITE_AGENT_RECORDING_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "white_agent_recordings.sqlite3")
+)
+
+RECORDING_MODES = ("record", "replay")
+
+RECORDING_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    prefix_hash TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    recorded_at REAL NOT NULL
+);
+"""
+
+
+def advance_prefix_hash(prefix_hash: str, message: str) -> str:
+    """Hash of a conversation prefix extended by one message sent to the white agent.
+
+    Chaining keeps the cost per turn constant instead of rehashing the whole
+    conversation.
+    """
+    digest = hashlib.sha256(prefix_hash.encode())
+    digest.update(hashlib.sha256(message.encode()).digest())
+    return digest.hexdigest()
+
+
+class MissingRecording(LookupError):
+    pass
+
+
+class ConversationRecordings:
+    """White agent replies on disk, keyed by the hash of the conversation so far."""
+
+    def __init__(self, mode: str, path: str = RECORDING_PATH):
+        if mode not in RECORDING_MODES:
+            raise ValueError(f"Unknown recording mode: {mode}")
+        self.mode = mode
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.executescript(RECORDING_SCHEMA)
+        self.lock = threading.Lock()
+        self.stats = {"replayed": 0, "recorded": 0, "missing": 0}
+        logger.info(f"White agent recordings in {mode} mode at {path}")
+
+    @classmethod
+    def from_env(cls) -> Optional["ConversationRecordings"]:
+        if RECORDING_MODE not in RECORDING_MODES:
+            return None
+        return cls(RECORDING_MODE, RECORDING_PATH)
+
+    def replay(self, prefix_hash: str) -> Optional[str]:
+        """The stored reply in replay mode; None when recording.
+
+        Raises MissingRecording in replay mode when the conversation was never
+        recorded, rather than falling back to the live white agent.
+        """
+        if self.mode != "replay":
+            return None
+
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT response FROM responses WHERE prefix_hash = ?", (prefix_hash,)
+            ).fetchone()
+            if row is None:
+                self.stats["missing"] += 1
+                raise MissingRecording(f"No recorded white agent response for conversation {prefix_hash[:12]}")
+            self.stats["replayed"] += 1
+        return row[0]
+
+    def record(self, prefix_hash: str, response: str):
+        if self.mode != "record":
+            return
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (prefix_hash, response, recorded_at) VALUES (?, ?, ?)",
+                (prefix_hash, response, time.time())
+            )
+            self.stats["recorded"] += 1
+
+    def get_stats(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.stats)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,168 @@
+import logging
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _coerce_string(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise TypeError("expected string")
+
+
+def _coerce_integer(value: Any) -> int:
+    if isinstance(value, bool):
+        raise TypeError("expected integer")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            pass
+    raise TypeError("expected integer")
+
+
+def _coerce_number(value: Any) -> float:
+    if isinstance(value, bool):
+        raise TypeError("expected number")
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        try:
+            return float(value.strip())
+        except ValueError:
+            pass
+    raise TypeError("expected number")
+
+
+def _coerce_boolean(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    raise TypeError("expected boolean")
+
+
+def _coerce_array(value: Any) -> List[Any]:
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    raise TypeError("expected array")
+
+
+_COERCERS: Dict[str, Callable[[Any], Any]] = {
+    "string": _coerce_string,
+    "integer": _coerce_integer,
+    "number": _coerce_number,
+    "boolean": _coerce_boolean,
+    "array": _coerce_array,
+}
+
+
+def _passthrough(value: Any) -> Any:
+    return value
+
+
+def _array_coercer(item_type: Optional[str]) -> Callable[[Any], List[Any]]:
+    """An array coercer that also coerces each element to the declared items type."""
+    coerce_item = _COERCERS.get(item_type)
+    if coerce_item is None:
+        return _coerce_array
+
+    def coerce(value: Any) -> List[Any]:
+        items = _coerce_array(value)
+        for index, item in enumerate(items):
+            try:
+                items[index] = coerce_item(item)
+            except TypeError as e:
+                raise TypeError(f"item {index}: {e}") from None
+        return items
+
+    return coerce
+
+
+def _coercer(param_info: Dict[str, Any]) -> Callable[[Any], Any]:
+    param_type = param_info.get("type")
+    if param_type == "array":
+        return _array_coercer(param_info.get("items", {}).get("type"))
+    return _COERCERS.get(param_type, _passthrough)
+
+
+class ToolSpec:
+    """A single tool from a domain's TOOLS dict with its argument checks precompiled."""
+
+    __slots__ = ("name", "handler_name", "coercers", "required")
+
+    def __init__(self, name: str, info: Dict[str, Any]):
+        parameters = info.get("parameters", {})
+        self.name = name
+        self.handler_name = f"_{name}"
+        self.coercers = {
+            param: _coercer(param_info)
+            for param, param_info in parameters.items()
+        }
+        self.required = tuple(
+            param for param, param_info in parameters.items()
+            if param_info.get("required", True)
+        )
+
+    def validate(self, kwargs: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+        """Coerce kwargs to the declared types. Returns (arguments, problems)."""
+        arguments = {}
+        problems = []
+
+        for param in self.required:
+            if param not in kwargs:
+                problems.append(f"missing required argument: {param}")
+
+        for param, value in kwargs.items():
+            coerce = self.coercers.get(param)
+            if coerce is None:
+                problems.append(f"unexpected argument: {param}")
+                continue
+            if value is None and param not in self.required:
+                # An explicit null for an optional argument means "not given"
+                arguments[param] = None
+                continue
+            try:
+                arguments[param] = coerce(value)
+            except TypeError as e:
+                problems.append(f"argument {param}: {e}, got {value!r}")
+
+        return arguments, problems
+
+
+class ToolRegistry:
+    """Tool specs for one domain, built once from its TOOLS dict."""
+
+    def __init__(self, tools: Dict[str, Dict[str, Any]]):
+        self.specs = {name: ToolSpec(name, info) for name, info in tools.items()}
+
+    def __contains__(self, tool_name: str) -> bool:
+        return tool_name in self.specs
+
+    def __iter__(self):
+        return iter(self.specs.values())
+
+    def prepare_call(self, tool_name: str, kwargs: Dict[str, Any]) -> Tuple[Optional[ToolSpec], Dict[str, Any], Optional[Dict[str, Any]]]:
+        """Look up a tool and validate its arguments before anything runs.
+
+        Returns (spec, arguments, error). On failure spec is None and error is
+        a structured error result that can be handed back to the agent as-is.
+        """
+        spec = self.specs.get(tool_name)
+        if spec is None:
+            return None, {}, {"error": f"Unknown tool: {tool_name}", "error_type": "unknown_tool"}
+
+        arguments, problems = spec.validate(kwargs)
+        if problems:
+            logger.debug(f"Rejected call to {tool_name}: {problems}")
+            return None, {}, {
+                "error": f"Invalid arguments for tool {tool_name}",
+                "error_type": "invalid_arguments",
+                "details": problems
+            }
+
+        return spec, arguments, None
@@ -0,0 +1,131 @@
+import importlib.util
+import logging
+import os
+import threading
+from typing import Dict, Any
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Keep-alive connections held per white agent URL, and the timeouts for each
+# call. Connection setup through a tunnel costs a TCP and TLS handshake, so
+# conversations reuse connections rather than opening one per turn.
+WHITE_AGENT_POOL_SIZE = int(os.getenv('WHITE_AGENT_POOL_SIZE', '10'))
+WHITE_AGENT_CONNECT_TIMEOUT = float(os.getenv('WHITE_AGENT_CONNECT_TIMEOUT', '5'))
+WHITE_AGENT_TIMEOUT = float(os.getenv('WHITE_AGENT_TIMEOUT', '30'))
+
+# httpx only negotiates HTTP/2 when the optional h2 package is installed.
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class WhiteAgentClients:
+    """Pooled keep-alive HTTP clients, one per white agent URL.
+
+    Blocking calls go through an httpx.Client and asyncio calls through an
+    httpx.AsyncClient; both speak HTTP/2 when the peer offers it. stats()
+    reports how many requests were served over reused connections.
+    """
+
+    def __init__(self, pool_size: int = WHITE_AGENT_POOL_SIZE,
+                 connect_timeout: float = WHITE_AGENT_CONNECT_TIMEOUT,
+                 timeout: float = WHITE_AGENT_TIMEOUT):
+        self.pool_size = max(1, pool_size)
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout
+        self._clients: Dict[str, httpx.Client] = {}
+        self._async_clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _client_options(self) -> Dict[str, Any]:
+        return {
+            "http2": HTTP2_AVAILABLE,
+            "limits": httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.pool_size
+            ),
+            "timeout": httpx.Timeout(self.timeout, connect=self.connect_timeout)
+        }
+
+    def _client(self, url: str) -> httpx.Client:
+        with self._lock:
+            client = self._clients.get(url)
+            if client is None:
+                if self._closed:
+                    raise RuntimeError("White agent clients are closed")
+                client = self._clients[url] = httpx.Client(**self._client_options())
+                self._stats.setdefault(url, _empty_stats())
+            return client
+
+    def _async_client(self, url: str) -> httpx.AsyncClient:
+        with self._lock:
+            client = self._async_clients.get(url)
+            if client is None:
+                if self._closed:
+                    raise RuntimeError("White agent clients are closed")
+                client = self._async_clients[url] = httpx.AsyncClient(**self._client_options())
+                self._stats.setdefault(url, _empty_stats())
+            return client
+
+    def _count(self, url: str, key: str):
+        with self._lock:
+            self._stats[url][key] += 1
+
+    def _record_response(self, url: str, response: httpx.Response):
+        self._count(url, "requests")
+        if response.http_version == "HTTP/2":
+            self._count(url, "http2_requests")
+
+    def post(self, url: str, path: str, payload: Dict[str, Any]) -> httpx.Response:
+        client = self._client(url)
+
+        def trace(event_name: str, info: Dict[str, Any]):
+            if event_name == "connection.connect_tcp.complete":
+                self._count(url, "connections")
+
+        response = client.post(f"{url}{path}", json=payload, extensions={"trace": trace})
+        self._record_response(url, response)
+        return response
+
+    async def post_async(self, url: str, path: str, payload: Dict[str, Any]) -> httpx.Response:
+        client = self._async_client(url)
+
+        async def trace(event_name: str, info: Dict[str, Any]):
+            if event_name == "connection.connect_tcp.complete":
+                self._count(url, "connections")
+
+        response = await client.post(f"{url}{path}", json=payload, extensions={"trace": trace})
+        self._record_response(url, response)
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-URL request and connection counts; reused = requests - connections."""
+        with self._lock:
+            stats = {url: dict(counts) for url, counts in self._stats.items()}
+
+        for entry in stats.values():
+            entry["reused"] = max(0, entry["requests"] - entry["connections"])
+            entry["reuse_rate"] = entry["reused"] / entry["requests"] if entry["requests"] else 0
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            client.close()
+
+    async def aclose(self):
+        with self._lock:
+            self._closed = True
+            clients = list(self._async_clients.values())
+            self._async_clients.clear()
+        for client in clients:
+            await client.aclose()
+
+
+def _empty_stats() -> Dict[str, int]:
+    return {"requests": 0, "connections": 0, "http2_requests": 0}
@@ -0,0 +1,69 @@
+from typing import Any, Callable, Dict, List
+
+# Rough tokens-per-character ratio; good enough to keep a history near a budget
+CHARS_PER_TOKEN = 4
+
+# Recent messages are never compacted, so the model always sees the latest
+# tool result in full.
+KEEP_RECENT_MESSAGES = 4
+
+# Characters kept from the start of an elided tool result, so the model can
+# still tell which call it answered.
+ELIDED_HEAD_CHARS = 200
+
+ELIDED_MARKER = "[earlier tool result elided:"
+ELIDED_SUFFIX = "... " + ELIDED_MARKER + " {chars} characters]"
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _content_tokens(message: Dict[str, Any]) -> int:
+    content = message["content"]
+    if isinstance(content, str):
+        return estimate_tokens(content)
+    return sum(estimate_tokens(block.get("text", "")) for block in content)
+
+
+def is_tool_result(content: str) -> bool:
+    return content.startswith("Tool result:")
+
+
+def compact_history(messages: List[Dict[str, Any]], max_tokens: int,
+                    is_tool_result: Callable[[str], bool] = is_tool_result,
+                    keep_recent: int = KEEP_RECENT_MESSAGES) -> int:
+    """Elide the oldest tool results in place until the history fits max_tokens.
+
+    The first message (the task and tool list, which is also the prompt-cache
+    prefix) and the last keep_recent messages are left alone. Returns the
+    estimated number of tokens saved; 0 when nothing was elided or max_tokens
+    is 0.
+    """
+    if max_tokens <= 0:
+        return 0
+
+    total = sum(_content_tokens(message) for message in messages)
+    saved = 0
+
+    for index in range(1, len(messages) - keep_recent):
+        if total <= max_tokens:
+            break
+
+        message = messages[index]
+        content = message["content"]
+        if message["role"] != "user" or not isinstance(content, str) or not is_tool_result(content):
+            continue
+        if content.endswith(" characters]") and ELIDED_MARKER in content:
+            continue
+
+        elided = content[:ELIDED_HEAD_CHARS] + ELIDED_SUFFIX.format(chars=len(content))
+        reduction = estimate_tokens(content) - estimate_tokens(elided)
+        if reduction <= 0:
+            continue
+
+        messages[index] = dict(message, content=elided)
+        total -= reduction
+        saved += reduction
+
+    return saved
@@ -1,5 +1,11 @@
 import os
+import sys
 import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from flask import Flask, request, jsonify
 from dotenv import load_dotenv
 
@@ -9,11 +15,19 @@ load_dotenv(os.path.join(project_root, '.env'))
 
 import anthropic
 
+sys.path.append(project_root)
+
+from white_agent.history_compaction import compact_history
+from white_agent.response_cache import ResponseCache, request_key
+
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
 
 # Initialize Anthropic client
 # Expects ANTHROPIC_API_KEY in environment variables or .env file
 client = anthropic.Anthropic()
+response_cache = ResponseCache.from_env()
 SYSTEM_PROMPT = """You are a tool-calling assistant. Respond with ONLY a JSON tool call in <json>...</json> tags.
 
 STRICT RULES:
@@ -46,29 +60,252 @@ WORKFLOWS:
 CRITICAL: Use flight_id/product_id from tool results. Customer/user ID defaults to 1.
 """
 
+TOOLS_MESSAGE_MARKER = "Here's a list of tools"
+JSON_CLOSE_TAG = "</json>"
+
+# Stream completions and stop as soon as the <json> action is closed, instead
+# of waiting for any text the model adds after it. Set LLM_AGENT_STREAM=0 to
+# wait for full completions.
+STREAM_RESPONSES = os.getenv('LLM_AGENT_STREAM', '1').lower() not in ('0', 'false', 'no')
+
+# Prompt-cache breakpoint. Everything up to and including a block marked with
+# it (the system prompt, then the tool list message) is reused across turns.
+CACHE_CONTROL = {"type": "ephemeral"}
+
+SYSTEM_BLOCKS = [{"type": "text", "text": SYSTEM_PROMPT, "cache_control": CACHE_CONTROL}]
+
+# Conversations kept per context_id. Sessions idle past the TTL are dropped,
+# and least recently used ones go first when there are too many or their
+# histories together pass the memory cap.
+MAX_SESSIONS = int(os.getenv('LLM_AGENT_MAX_SESSIONS', '256'))
+SESSION_TTL = float(os.getenv('LLM_AGENT_SESSION_TTL', '1800'))
+SESSION_MAX_BYTES = int(float(os.getenv('LLM_AGENT_SESSION_MAX_MB', '64')) * 1024 * 1024)
+
+# Estimated history size, in tokens, past which old tool results are elided.
+# 0 keeps the full history.
+HISTORY_TOKEN_BUDGET = int(os.getenv('LLM_AGENT_HISTORY_TOKENS', '8000'))
+
+
+def _message_size(message):
+    content = message["content"]
+    if isinstance(content, str):
+        return len(content)
+    return sum(len(block.get("text", "")) for block in content)
+
 class ClaudeAgent:
     def __init__(self):
         self.history = []
+        # Input/output token counts of each turn, split by prompt-cache use
+        self.usage = []
+        # Approximate size of history in characters, for the session memory cap
+        self.history_bytes = 0
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+        # Requests holding this session; SessionStore never evicts a session in use
+        self.users = 0
 
     def reset(self):
         self.history = []
+        self.usage = []
+        self.history_bytes = 0
+
+    def _user_message(self, message):
+        # The first tool list message ends the static prefix of every conversation
+        if not self.history and TOOLS_MESSAGE_MARKER in message:
+            return {
+                "role": "user",
+                "content": [{"type": "text", "text": message, "cache_control": CACHE_CONTROL}]
+            }
+        return {"role": "user", "content": message}
 
     def process_message(self, message):
-        self.history.append({"role": "user", "content": message})
-
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=2048,
-            temperature=0.0,
-            system=SYSTEM_PROMPT,
-            messages=self.history
-        )
+        user_message = self._user_message(message)
+        self.history.append(user_message)
+        self.history_bytes += _message_size(user_message)
+
+        tokens_saved = compact_history(self.history, HISTORY_TOKEN_BUDGET)
+        if tokens_saved:
+            self.history_bytes = sum(_message_size(m) for m in self.history)
 
-        content = response.content[0].text
+        content = self._complete({
+            "model": "claude-sonnet-4-20250514",
+            "max_tokens": 2048,
+            "temperature": 0.0,
+            "system": SYSTEM_BLOCKS,
+            "messages": self.history
+        })
+        self.usage[-1]["history_tokens_saved"] = tokens_saved
         self.history.append({"role": "assistant", "content": content})
+        self.history_bytes += len(content)
+        return content
+
+    def _complete(self, request):
+        """Call the model, serving identical requests from the response cache if enabled."""
+        if response_cache is None:
+            return self._create(request)
+
+        key = request_key(request)
+        content = response_cache.get(key)
+        if content is None:
+            content = self._create(request)
+            response_cache.put(key, content)
+        else:
+            self._record_usage(None)
         return content
 
+    def _create(self, request):
+        if STREAM_RESPONSES:
+            return self._create_streaming(request)
+
+        started = time.monotonic()
+        response = client.messages.create(**request)
+        elapsed = time.monotonic() - started
+        self._record_usage(response.usage, {"time_to_first_token": None, "time_to_action": elapsed, "stopped_early": False})
+        return response.content[0].text
+
+    def _create_streaming(self, request):
+        """Stream the completion and return once the closing </json> tag arrives.
+
+        Leaving the stream early closes the response, which cancels the rest of
+        the generation.
+        """
+        started = time.monotonic()
+        first_token = None
+        stopped_early = False
+        text = ""
+
+        with client.messages.stream(**request) as stream:
+            for delta in stream.text_stream:
+                if first_token is None:
+                    first_token = time.monotonic() - started
+                # Only the new text, plus enough before it to catch a split tag
+                scan_from = max(0, len(text) - len(JSON_CLOSE_TAG) + 1)
+                text += delta
+                close = text.find(JSON_CLOSE_TAG, scan_from)
+                if close != -1:
+                    text = text[:close + len(JSON_CLOSE_TAG)]
+                    stopped_early = True
+                    break
+            snapshot = getattr(stream, "current_message_snapshot", None)
+            usage = getattr(snapshot, "usage", None)
+
+        self._record_usage(usage, {
+            "time_to_first_token": first_token,
+            "time_to_action": time.monotonic() - started,
+            "stopped_early": stopped_early
+        })
+        return text
+
+    def _record_usage(self, usage, timing=None):
+        """Token counts and latency for this turn; usage is None when the response cache answered."""
+        turn = {
+            "turn": len(self.usage) + 1,
+            "response_cache_hit": usage is None and timing is None,
+            "cached_input_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0,
+            "cache_write_input_tokens": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+            "uncached_input_tokens": getattr(usage, "input_tokens", 0) or 0,
+            "output_tokens": getattr(usage, "output_tokens", 0) or 0
+        }
+        turn.update(timing or {})
+        self.usage.append(turn)
+        logger.info(
+            f"Turn {turn['turn']}: {turn['cached_input_tokens']} cached, "
+            f"{turn['cache_write_input_tokens']} cache-write, "
+            f"{turn['uncached_input_tokens']} uncached input tokens, "
+            f"action after {turn.get('time_to_action') or 0:.2f}s"
+        )
+
+    def usage_summary(self):
+        totals = {
+            key: sum(turn.get(key, 0) for turn in self.usage)
+            for key in (
+                "cached_input_tokens", "cache_write_input_tokens", "uncached_input_tokens",
+                "output_tokens", "history_tokens_saved"
+            )
+        }
+        return {"turns": self.usage, "totals": totals}
+
+class SessionStore:
+    """ClaudeAgent sessions keyed by context_id, in least recently used order."""
+
+    def __init__(self, max_sessions=MAX_SESSIONS, ttl=SESSION_TTL, max_bytes=SESSION_MAX_BYTES):
+        self.max_sessions = max(1, max_sessions)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"created": 0, "evicted": 0}
+
+    @contextmanager
+    def use(self, context_id):
+        """The session for context_id, locked for one turn and safe from eviction until it ends."""
+        with self.lock:
+            now = time.monotonic()
+            session = self.sessions.get(context_id)
+            if session is None:
+                session = self.sessions[context_id] = ClaudeAgent()
+                self.stats["created"] += 1
+            else:
+                self.sessions.move_to_end(context_id)
+            session.last_used = now
+            session.users += 1
+            self._evict(now)
+
+        try:
+            with session.lock:
+                yield session
+        finally:
+            with self.lock:
+                session.users -= 1
+                session.last_used = time.monotonic()
+
+    def find(self, context_id):
+        with self.lock:
+            return self.sessions.get(context_id)
+
+    def _evict(self, now):
+        # Sessions in the middle of a turn are skipped, so their history is never dropped
+        expired = [
+            context_id for context_id, session in self.sessions.items()
+            if now - session.last_used > self.ttl and not session.users
+        ]
+        for context_id in expired:
+            self._drop(context_id)
+
+        total_bytes = sum(session.history_bytes for session in self.sessions.values())
+        for context_id, session in list(self.sessions.items()):
+            if len(self.sessions) <= self.max_sessions and total_bytes <= self.max_bytes:
+                break
+            if session.users:
+                continue
+            total_bytes -= self._drop(context_id).history_bytes
+
+    def _drop(self, context_id):
+        self.stats["evicted"] += 1
+        return self.sessions.pop(context_id)
+
+    def get_stats(self):
+        with self.lock:
+            return dict(
+                self.stats,
+                sessions=len(self.sessions),
+                history_bytes=sum(session.history_bytes for session in self.sessions.values())
+            )
+
+
+# Used when a request carries no context_id
 agent = ClaudeAgent()
+sessions = SessionStore()
+
+
+@contextmanager
+def _session_for(context_id):
+    if context_id:
+        with sessions.use(context_id) as session:
+            yield session
+    else:
+        with agent.lock:
+            yield agent
 
 @app.route('/agent-card', methods=['GET'])
 def get_agent_card():
@@ -82,18 +319,32 @@ def send_message():
     try:
         data = request.get_json()
         message = data.get('message', '')
+        # One turn at a time per conversation
+        with _session_for(data.get('context_id')) as session:
+            # Check if this is a new task
+            if TOOLS_MESSAGE_MARKER in message:
+                session.reset()
 
-        # Check if this is a new task
-        if "Here's a list of tools" in message:
-            agent.reset()
-
-        response_text = agent.process_message(message)
+            response_text = session.process_message(message)
         # Return as plain text, not JSON-encoded
         return response_text, 200, {'Content-Type': 'text/plain'}
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/usage', methods=['GET'])
+def get_usage():
+    """Per-turn prompt-cache token counts for a conversation (?context_id=...)."""
+    context_id = request.args.get('context_id')
+    session = sessions.find(context_id) if context_id else agent
+    if session is None:
+        return jsonify({"error": f"Unknown context: {context_id}"}), 404
+    return jsonify(session.usage_summary())
+
+@app.route('/sessions', methods=['GET'])
+def get_sessions():
+    return jsonify(sessions.get_stats())
+
 @app.route('/.well-known/agent-card.json', methods=['GET'])
 def get_agent_card_well_known():
     return jsonify({
@@ -1,5 +1,7 @@
 import json
 import re
+import threading
+from collections import OrderedDict
 from flask import Flask, request, jsonify
 from typing import Dict, Any
 
@@ -160,6 +162,27 @@ app = Flask(__name__)
 
 mock_agent = MockWhiteAgent()
 
+# One mock agent per conversation context, so concurrent evaluations from the
+# green agent do not share scenario and turn state.
+MAX_CONTEXTS = 1000
+context_agents: "OrderedDict[str, MockWhiteAgent]" = OrderedDict()
+context_agents_lock = threading.Lock()
+
+
+def _agent_for_context(context_id) -> MockWhiteAgent:
+    if not context_id:
+        return mock_agent
+    
+    with context_agents_lock:
+        agent = context_agents.get(context_id)
+        if agent is None:
+            agent = context_agents[context_id] = MockWhiteAgent()
+            while len(context_agents) > MAX_CONTEXTS:
+                context_agents.popitem(last=False)
+        else:
+            context_agents.move_to_end(context_id)
+        return agent
+
 
 @app.route('/agent-card', methods=['GET'])
 def get_agent_card():
@@ -172,7 +195,7 @@ def send_message():
         data = request.get_json()
         message = data.get('message', '')
         
-        response = mock_agent.process_message(message)
+        response = _agent_for_context(data.get('context_id')).process_message(message)
         
         return response
         
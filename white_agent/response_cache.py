@@ -0,0 +1,106 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: set LLM_RESPONSE_CACHE=1 to reuse completions for identical requests.
+# The cache is safe because the agent samples at temperature 0.
+RESPONSE_CACHE_ENABLED = os.getenv('LLM_RESPONSE_CACHE', '').lower() in ('1', 'true', 'yes')
+RESPONSE_CACHE_PATH = os.getenv(
+    'LLM_RESPONSE_CACHE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "llm_response_cache.sqlite3")
+)
+RESPONSE_CACHE_MAX_BYTES = int(float(os.getenv('LLM_RESPONSE_CACHE_MAX_MB', '256')) * 1024 * 1024)
+
+# Least recently used entries looked up per eviction query
+EVICTION_BATCH = 64
+
+RESPONSE_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used);
+"""
+
+
+def request_key(request: Dict[str, Any]) -> str:
+    """Content address of a completion request: model, system prompt, messages and sampling settings."""
+    canonical = json.dumps(request, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class ResponseCache:
+    """Completions stored in SQLite, evicting the least recently used past max_bytes."""
+
+    def __init__(self, path: str = RESPONSE_CACHE_PATH, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(RESPONSE_CACHE_SCHEMA)
+        self.lock = threading.Lock()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @classmethod
+    def from_env(cls) -> Optional["ResponseCache"]:
+        if not RESPONSE_CACHE_ENABLED:
+            return None
+        logger.info(f"LLM response cache enabled at {RESPONSE_CACHE_PATH}")
+        return cls()
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            row = self.conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.stats["hits"] += 1
+            return row[0]
+
+    def put(self, key: str, response: str):
+        size = len(key) + len(response.encode())
+        if size > self.max_bytes:
+            return
+
+        with self.lock, self.conn:
+            previous = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, response, size, time.time())
+            )
+            self.total_bytes += size - (previous[0] if previous else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes:
+            oldest = self.conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_used LIMIT ?", (EVICTION_BATCH,)
+            ).fetchall()
+            if not oldest:
+                break
+            for old_key, old_size in oldest:
+                if self.total_bytes <= self.max_bytes:
+                    break
+                self.conn.execute("DELETE FROM responses WHERE key = ?", (old_key,))
+                self.total_bytes -= old_size
+                self.stats["evictions"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return dict(self.stats, bytes=self.total_bytes, max_bytes=self.max_bytes)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()